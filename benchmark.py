@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+⏱️ WHOIS - Benchmarks for the Domain Information Lookup Tool
+Created by: Muhammad Hassnain
+Version: 1.0.0
+"""
+
+import argparse
+import asyncio
+import gc
+import glob
+import json
+import os
+import platform
+import py_compile
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import zlib
+from datetime import datetime
+
+import main
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'whois')
+
+def load_fixtures(directory=FIXTURES_DIR):
+    """Load recorded raw WHOIS responses as (domain, text) pairs"""
+    corpus = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.txt'))):
+        with open(path, encoding='utf-8') as f:
+            corpus.append((os.path.basename(path)[:-len('.txt')], f.read()))
+    return corpus
+
+def percentile(values, fraction):
+    """Return the nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+# ========== FAKE WHOIS SERVER ==========
+class FakeWHOISServer:
+    """Local port 43 stand-in serving recorded responses on its own thread"""
+    def __init__(self, corpus, latency=0.02, jitter=0.0, error_rate=0.0, rate_limit=0, seed=1):
+        self.host = '127.0.0.1'
+        self.port = None
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        # Queries per second before answering "limit exceeded", 0 for unlimited
+        self.rate_limit = rate_limit
+        self.random = random.Random(seed)
+        self.queries = 0
+        self.errors = 0
+        self.throttled = 0
+        self._window = []
+        # Registrar referrals point back at this server so lookups stay local;
+        # "no match" answers are left out so every served lookup parses
+        self.responses = [main.AsyncWHOISClient.REGISTRAR_REFER.sub(
+                          lambda m: m.group(0).replace(m.group(1), self.host), text)
+                          for _, text in corpus if not main.NOT_FOUND_PATTERN.search(text)]
+        self._loop = None
+        self._server = None
+        self._thread = None
+
+    async def handle(self, reader, writer):
+        """Answer one WHOIS query"""
+        query = (await reader.readline()).decode(errors='replace').strip()
+        self.queries += 1
+        await asyncio.sleep(max(0, self.latency + self.random.uniform(-self.jitter, self.jitter)))
+
+        if '.' not in query:
+            # IANA style TLD query
+            writer.write(f"refer:        {self.host}\n".encode())
+        elif self.random.random() < self.error_rate:
+            self.errors += 1
+            writer.transport.abort()
+            return
+        elif self.is_limited():
+            self.throttled += 1
+            writer.write(b"WHOIS LIMIT EXCEEDED - SEE WWW.EXAMPLE.NET/WHOIS FOR DETAILS\n")
+        else:
+            writer.write(self.responses[zlib.crc32(query.encode()) % len(self.responses)].encode())
+        await writer.drain()
+        writer.close()
+
+    def is_limited(self):
+        """Check the server-wide one second rate limit window"""
+        if not self.rate_limit:
+            return False
+        now = time.monotonic()
+        self._window = [t for t in self._window if now - t < 1]
+        if len(self._window) >= self.rate_limit:
+            return True
+        self._window.append(now)
+        return False
+
+    def start(self):
+        """Start serving on a free port in a background thread"""
+        started = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self.handle, self.host, 0, backlog=1024))
+            self.port = self._server.sockets[0].getsockname()[1]
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        started.wait()
+        return self
+
+    def stop(self):
+        """Stop the server thread"""
+        self._loop.call_soon_threadsafe(self._server.close)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+# ========== BENCHMARKS ==========
+def bench_parse(parse, corpus, repeat):
+    """Return records parsed per second for a parse(domain, text) callable"""
+    count = 0
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for domain, text in corpus:
+            try:
+                parse(domain, text)
+            except Exception:
+                # "No match" fixtures raise by design
+                pass
+            count += 1
+    return count / (time.perf_counter() - started)
+
+def run_parse_benchmark(corpus, repeat):
+    """Compare the built-in parser against the python-whois parser"""
+    results = {'builtin': bench_parse(main.WHOISParser().parse, corpus, repeat)}
+    try:
+        import whois
+        results['python-whois'] = bench_parse(whois.parser.WhoisEntry.load, corpus, repeat)
+    except ImportError:
+        pass
+    return {name: {'records_per_sec': rate} for name, rate in results.items()}
+
+def run_render_benchmark(corpus, repeat):
+    """Measure format_whois_output and show_summary_stats cost per record"""
+    parser = main.WHOISParser()
+    records = []
+    for domain, text in corpus:
+        try:
+            records.append(parser.parse(domain, text))
+        except main.WHOISLookupError:
+            pass
+
+    results = {}
+    for mode, quiet in (('color', False), ('plain', True)):
+        tool = main.ColorfulWHOIS(quiet=quiet)
+        for name, render in (('format_whois_output', tool.format_whois_output),
+                             ('show_summary_stats', tool.show_summary_stats)):
+            started = time.perf_counter()
+            for _ in range(repeat):
+                for record in records:
+                    render(record)
+            elapsed = time.perf_counter() - started
+            results[f"{name}_{mode}"] = {'us_per_record': elapsed / (repeat * len(records)) * 1e6}
+    return results
+
+def run_memory_benchmark(corpus, count):
+    """Measure memory held per domain as parsed dicts, compact records and a columnar batch"""
+    parser = main.WHOISParser()
+    parsed = []
+    for domain, text in corpus:
+        try:
+            parser.parse(domain, text)
+            parsed.append((domain, text))
+        except main.WHOISLookupError:
+            pass
+
+    results = {}
+    for kind in ('dict', 'compact', 'batch'):
+        gc.collect()
+        tracemalloc.start()
+        records = main.RecordBatch() if kind == 'batch' else []
+        # Compact records share equal tuples through a table that lives as long as they do
+        tuples = {}
+        for i in range(count):
+            domain, text = parsed[i % len(parsed)]
+            record = parser.parse(domain, text)
+            # Every record gets its own name, as in a real sweep
+            record['domain_name'] = f"{kind}{i}.{domain}"
+            records.append(main.CompactRecord.from_record(record, tuples) if kind == 'compact' else record)
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del records, tuples
+        results[kind] = {'bytes_per_domain': size / count}
+    return results
+
+async def _lookup_run(tool, domains, concurrency):
+    """Run lookups with a fixed number in flight and collect latencies"""
+    domains = iter(domains)
+    latencies = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for domain in domains:
+            started = time.perf_counter()
+            try:
+                await tool.query_domain_async(domain)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - started, latencies, errors
+
+def run_lookup_benchmark(server, lookups, concurrency_levels, timeout):
+    """Measure end-to-end lookups per second against the fake server"""
+    results = []
+    for concurrency in concurrency_levels:
+        tool = main.ColorfulWHOIS(quiet=True)
+        # Client side limits are lifted so the server behaviour is what gets measured
+        scheduler = main.ServerScheduler(default_rate=1e9, default_concurrency=max(concurrency_levels))
+        tool.client = main.AsyncWHOISClient(connect_timeout=timeout, read_timeout=timeout, port=server.port,
+                                            iana_server=server.host, scheduler=scheduler)
+        domains = [f"bench{i}.{('com', 'org', 'net', 'uk', 'de')[i % 5]}" for i in range(lookups)]
+
+        elapsed, latencies, errors = asyncio.run(_lookup_run(tool, domains, concurrency))
+        results.append({
+            'concurrency': concurrency,
+            'lookups': lookups,
+            'errors': errors,
+            'lookups_per_sec': lookups / elapsed,
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p90_ms': percentile(latencies, 0.90) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+        })
+    return results
+
+def time_commands(commands, runs):
+    """Return the best wall time in seconds of each command, run interleaved in this directory"""
+    best = {name: None for name in commands}
+    for _ in range(runs):
+        # Interleaving spreads machine noise evenly over the commands
+        for name, args in commands.items():
+            started = time.perf_counter()
+            subprocess.run(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True,
+                           cwd=os.path.dirname(os.path.abspath(__file__)))
+            elapsed = time.perf_counter() - started
+            best[name] = elapsed if best[name] is None else min(best[name], elapsed)
+    return best
+
+def run_startup_benchmark(corpus, runs):
+    """Measure --help and a cache-hit lookup as separate processes"""
+    domain, text = next((domain, text) for domain, text in corpus if not main.NOT_FOUND_PATTERN.search(text))
+    with tempfile.TemporaryDirectory() as directory:
+        cache_path = os.path.join(directory, 'responses.sqlite3')
+        cache = main.WHOISCache(cache_path)
+        cache.put(main.WHOISResponse(domain, text, ['whois.example']))
+        cache.close()
+
+        # Startup is measured from cached bytecode, as after the first run of an installed copy
+        py_compile.compile(main.__file__)
+
+        best = time_commands({
+            'interpreter': [sys.executable, '-c', 'pass'],
+            'help': [sys.executable, '-m', 'main', '--help'],
+            'cache_hit': [sys.executable, '-m', 'main', domain, '--cache-path', cache_path],
+        }, runs)
+    # The time above bare interpreter startup is what the tool itself costs
+    return {name: {'ms': elapsed * 1000, 'overhead_ms': (elapsed - best['interpreter']) * 1000}
+            for name, elapsed in best.items()}
+
+def git_commit():
+    """Return the current git commit, if any"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def compare_results(baseline, results):
+    """Print relative changes of the headline numbers against a baseline run"""
+    def headline(data):
+        numbers = {}
+        for name, values in data.get('parse', {}).items():
+            numbers[f"parse {name} records/s"] = values['records_per_sec']
+        for name, values in data.get('render', {}).items():
+            numbers[f"render {name} us"] = values['us_per_record']
+        for name, values in data.get('memory', {}).items():
+            numbers[f"memory {name} bytes/domain"] = values['bytes_per_domain']
+        for name, values in data.get('startup', {}).items():
+            numbers[f"startup {name} ms"] = values['ms']
+        for run in data.get('lookup', []):
+            numbers[f"lookup c={run['concurrency']} lookups/s"] = run['lookups_per_sec']
+            numbers[f"lookup c={run['concurrency']} p99 ms"] = run['p99_ms']
+        return numbers
+
+    before = headline(baseline)
+    after = headline(results)
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'}")
+    for key in after:
+        if key in before and before[key]:
+            print(f"  {key:<40} {(after[key] - before[key]) / before[key] * 100:>+8.1f}%")
+
+def main_cli():
+    parser = argparse.ArgumentParser(description='Benchmark the WHOIS lookup tool')
+    parser.add_argument('--fixtures', default=FIXTURES_DIR, help='Directory of recorded raw WHOIS responses')
+    parser.add_argument('--sections', default='startup,parse,render,memory,lookup', help='Comma separated benchmarks to run (default: startup,parse,render,memory,lookup)')
+    parser.add_argument('--repeat', type=int, default=200, help='Passes over the fixture corpus (default: 200)')
+    parser.add_argument('--startup-runs', type=int, default=20, help='Runs per startup measurement, the best one counts (default: 20)')
+    parser.add_argument('--startup-budget', type=float, default=50, help='Allowed wall time in ms for --help and a cache hit (default: 50)')
+    parser.add_argument('--records', type=int, default=20000, help='Records held for the memory benchmark (default: 20000)')
+    parser.add_argument('--lookups', type=int, default=2000, help='Lookups per concurrency level (default: 2000)')
+    parser.add_argument('--concurrency', default='1,10,100', help='Comma separated concurrency levels (default: 1,10,100)')
+    parser.add_argument('--latency', type=float, default=20, help='Fake server latency in ms (default: 20)')
+    parser.add_argument('--jitter', type=float, default=0, help='Fake server latency jitter in ms (default: 0)')
+    parser.add_argument('--error-rate', type=float, default=0, help='Fraction of queries the fake server drops (default: 0)')
+    parser.add_argument('--server-rate', type=int, default=0, help='Fake server queries per second before throttling, 0 for none')
+    parser.add_argument('--timeout', type=float, default=5, help='Client connect and read timeout in seconds (default: 5)')
+    parser.add_argument('--json-out', help='Write machine-readable results to this file')
+    parser.add_argument('--compare', help='Earlier --json-out file to compare against')
+    args = parser.parse_args()
+
+    sections = set(args.sections.split(','))
+    corpus = load_fixtures(args.fixtures)
+    if not corpus:
+        parser.error(f'no fixtures found in {args.fixtures}')
+
+    results = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'settings': vars(args),
+    }
+
+    over_budget = []
+    if 'startup' in sections:
+        print(f"Startup (best of {args.startup_runs} runs, budget {args.startup_budget:g}ms)")
+        results['startup'] = run_startup_benchmark(corpus, args.startup_runs)
+        for name, values in results['startup'].items():
+            verdict = ''
+            if name != 'interpreter':
+                verdict = '  ok' if values['ms'] <= args.startup_budget else '  OVER BUDGET'
+                if verdict != '  ok':
+                    over_budget.append(name)
+            print(f"  {name:<30} {values['ms']:>10.1f} ms  (+{values['overhead_ms']:.1f} ms){verdict}")
+
+    if 'parse' in sections:
+        print(f"Parse throughput ({len(corpus)} fixtures x {args.repeat} passes)")
+        results['parse'] = run_parse_benchmark(corpus, args.repeat)
+        for name, values in results['parse'].items():
+            print(f"  {name:<30} {values['records_per_sec']:>12,.0f} records/s")
+
+    if 'render' in sections:
+        print("Render cost")
+        results['render'] = run_render_benchmark(corpus, args.repeat)
+        for name, values in results['render'].items():
+            print(f"  {name:<30} {values['us_per_record']:>12.1f} us/record")
+
+    if 'memory' in sections:
+        print(f"Memory held per domain ({args.records} records)")
+        results['memory'] = run_memory_benchmark(corpus, args.records)
+        baseline = results['memory']['dict']['bytes_per_domain']
+        for name, values in results['memory'].items():
+            ratio = f"  {baseline / values['bytes_per_domain']:.1f}x smaller" if name != 'dict' else ''
+            print(f"  {name:<30} {values['bytes_per_domain']:>12,.0f} bytes{ratio}")
+
+    if 'lookup' in sections:
+        server = FakeWHOISServer(corpus, latency=args.latency / 1000, jitter=args.jitter / 1000,
+                                 error_rate=args.error_rate, rate_limit=args.server_rate).start()
+        try:
+            levels = [int(level) for level in args.concurrency.split(',')]
+            print(f"Lookups against fake server ({args.latency:g}ms latency, {args.lookups} lookups per level)")
+            results['lookup'] = run_lookup_benchmark(server, args.lookups, levels, args.timeout)
+        finally:
+            server.stop()
+        for run in results['lookup']:
+            print(f"  c={run['concurrency']:<5} {run['lookups_per_sec']:>10,.0f} lookups/s  "
+                  f"p50 {run['p50_ms']:.1f}ms  p90 {run['p90_ms']:.1f}ms  p99 {run['p99_ms']:.1f}ms  "
+                  f"errors {run['errors']}")
+
+    if args.json_out:
+        with open(args.json_out, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare_results(json.load(f), results)
+
+    # A startup regression fails the run so it can gate CI
+    if over_budget:
+        print(f"\nStartup over budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main_cli()
@@ -5,12 +5,15 @@ Created by: Muhammad Hassnain
 Version: 1.0.0
 """
 
-import socket
 import sys
+import os
 import argparse
-import json
-from datetime import datetime
-import whois as whois_lib
+import re
+import contextlib
+import bisect
+import itertools
+from collections import Counter, OrderedDict, defaultdict, deque, namedtuple
+from datetime import datetime, timedelta
 import time
 
 # ========== EXTENDED COLOR PALETTE ==========
@@ -72,14 +75,1228 @@ class Colors:
     MAGIC_ICON = "✨ "
     FIRE_ICON = "🔥 "
 
-class ColorfulWHOIS:
+class PlainColors(Colors):
+    """Palette without ANSI codes for non-interactive output"""
+    BLACK = ''
+    RED = ''
+    GREEN = ''
+    YELLOW = ''
+    BLUE = ''
+    MAGENTA = ''
+    CYAN = ''
+    WHITE = ''
+    BOLD_BLACK = ''
+    BOLD_RED = ''
+    BOLD_GREEN = ''
+    BOLD_YELLOW = ''
+    BOLD_BLUE = ''
+    BOLD_MAGENTA = ''
+    BOLD_CYAN = ''
+    BOLD_WHITE = ''
+    BG_BLACK = ''
+    BG_RED = ''
+    BG_GREEN = ''
+    BG_YELLOW = ''
+    BG_BLUE = ''
+    BG_MAGENTA = ''
+    BG_CYAN = ''
+    BG_WHITE = ''
+    BOLD = ''
+    UNDERLINE = ''
+    BLINK = ''
+    REVERSE = ''
+    DIM = ''
+    ENDC = ''
+
+# ========== PER-SERVER SCHEDULER ==========
+class TokenBucket:
+    """Token bucket limiting the query rate to one WHOIS server"""
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+    
+    def reserve(self):
+        """Take a token and return how long to wait before using it"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0 if self.tokens >= 0 else -self.tokens / self.rate
+
+class ServerState:
+    """Limits and backoff state for a single WHOIS server"""
+    def __init__(self, rate, concurrency):
+        import asyncio
+        self.base_rate = rate
+        self.bucket = TokenBucket(rate, max(1, concurrency))
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.paused_until = 0
+        self.backoff = 0
+        self.throttles = 0
+
+class ServerScheduler:
+    """Per-server token buckets and concurrency caps with adaptive backoff"""
+    DEFAULT_RATE = 5.0
+    DEFAULT_CONCURRENCY = 10
+    MIN_RATE = 0.2
+    MAX_BACKOFF = 60
+    
+    THROTTLED = re.compile(r'limit exceeded|exceeded the (?:query|request) limit|too many (?:requests|queries|connections)|quota exceeded|rate limit',
+                           re.IGNORECASE)
+    
+    def __init__(self, limits=None, default_rate=DEFAULT_RATE, default_concurrency=DEFAULT_CONCURRENCY, shards=1):
+        # host -> (queries per second, concurrent connections)
+        self.limits = dict(limits or {})
+        self.default_rate = default_rate
+        self.default_concurrency = default_concurrency
+        # In a sweep sharded by TLD every shard reaches IANA and the registrar
+        # servers, so those get an equal share of their limits; the registry
+        # servers of this shard's own TLDs are claimed and keep the full limits
+        self.shards = shards
+        self.claimed = set()
+        self.servers = {}
+    
+    def claim(self, host):
+        """Mark a server as reached by this shard only"""
+        self.claimed.add(host)
+    
+    def state(self, host):
+        """Return the state for a server, creating it on first use"""
+        if host not in self.servers:
+            rate, concurrency = self.limits.get(host, (self.default_rate, self.default_concurrency))
+            if self.shards > 1 and host not in self.claimed:
+                rate, concurrency = rate / self.shards, max(1, concurrency // self.shards)
+            self.servers[host] = ServerState(rate, concurrency)
+        return self.servers[host]
+    
+    @contextlib.asynccontextmanager
+    async def slot(self, host):
+        """Wait for a free connection and a rate token for a server"""
+        import asyncio
+        state = self.state(host)
+        async with state.semaphore:
+            while True:
+                throttles = state.throttles
+                wait = state.bucket.reserve()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                # A reservation made before the server throttled us is stale
+                if state.throttles == throttles:
+                    break
+            yield state
+    
+    def is_throttled(self, text):
+        """Check whether a response is a rate limit refusal"""
+        # Only look at the head so legal boilerplate at the end cannot match
+        return bool(self.THROTTLED.search(text[:1000]))
+    
+    def record_success(self, host):
+        """Slowly restore the rate after successful queries"""
+        state = self.state(host)
+        state.backoff = 0
+        bucket = state.bucket
+        if bucket.rate < state.base_rate:
+            bucket.rate = min(state.base_rate, bucket.rate + state.base_rate * 0.1)
+    
+    def record_throttle(self, host):
+        """Halve the rate and pause a server after it refused us"""
+        state = self.state(host)
+        now = time.monotonic()
+        # Queries already in flight when we paused must not escalate the backoff again
+        if now < state.paused_until:
+            return
+        bucket = state.bucket
+        bucket.rate = max(self.MIN_RATE, bucket.rate / 2)
+        state.backoff = min(self.MAX_BACKOFF, state.backoff * 2 or 1)
+        state.paused_until = now + state.backoff
+        state.throttles += 1
+        # Put the bucket into debt so no burst follows the pause
+        bucket.tokens = -state.backoff * bucket.rate
+        bucket.updated = now
+
+def parse_server_limit(text):
+    """Parse a HOST=RATE[/CONCURRENCY] server limit option"""
+    try:
+        host, limit = text.split('=', 1)
+        rate, _, concurrency = limit.partition('/')
+        rate = float(rate)
+        concurrency = int(concurrency) if concurrency else ServerScheduler.DEFAULT_CONCURRENCY
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid server limit '{text}', expected HOST=RATE[/CONCURRENCY]")
+    if rate <= 0 or concurrency < 1:
+        raise argparse.ArgumentTypeError(f"invalid server limit '{text}', rate and concurrency must be positive")
+    return host.strip().lower(), (rate, concurrency)
+
+def interleave_by_tld(domains, window=1000):
+    """Reorder a domain stream so consecutive lookups hit different registries"""
+    domains = iter(domains)
+    buckets = OrderedDict()
+    buffered = 0
+    exhausted = False
+    
+    while True:
+        # Keep a bounded look-ahead window so the input is still streamed
+        while not exhausted and buffered < window:
+            domain = next(domains, None)
+            if domain is None:
+                exhausted = True
+                break
+            buckets.setdefault(domain.rsplit('.', 1)[-1].lower(), deque()).append(domain)
+            buffered += 1
+        
+        if not buckets:
+            return
+        
+        # One domain per TLD per round
+        for tld in list(buckets):
+            queue = buckets[tld]
+            yield queue.popleft()
+            buffered -= 1
+            if not queue:
+                del buckets[tld]
+
+# ========== ASYNC WHOIS CLIENT ==========
+class WHOISLookupError(Exception):
+    """Raised when a WHOIS query cannot be completed"""
+
+class WHOISTimeoutError(WHOISLookupError):
+    """Raised when connecting to or reading from a WHOIS server times out"""
+
+class WHOISThrottledError(WHOISLookupError):
+    """Raised when a WHOIS server keeps refusing queries over its rate limit"""
+
+class WHOISNotFoundError(WHOISLookupError):
+    """Raised when the registry answers that a domain is not registered"""
+
+# Failures worth another attempt later, as opposed to "no match" and the like
+RETRIABLE_ERRORS = (WHOISTimeoutError, WHOISThrottledError, OSError)
+
+WHOISResponse = namedtuple('WHOISResponse', ['domain', 'text', 'servers'])
+
+class AsyncWHOISClient:
+    """Asyncio WHOIS client speaking the port 43 protocol directly"""
+    IANA_SERVER = 'whois.iana.org'
+    
+    # Some registries need a special query syntax for an exact domain match
+    QUERY_FORMATS = {
+        'whois.verisign-grs.com': 'domain {}',
+        'whois.denic.de': '-T dn,ace {}',
+    }
+    
+    IANA_REFER = re.compile(r'^[ \t]*(?:refer|whois):[ \t]*(\S+)', re.IGNORECASE | re.MULTILINE)
+    REGISTRAR_REFER = re.compile(r'^[ \t]*(?:Registrar WHOIS Server|Whois Server):[ \t]*(\S+)', re.IGNORECASE | re.MULTILINE)
+    
+    def __init__(self, connect_timeout=10, read_timeout=10, port=43, iana_server=IANA_SERVER, max_referrals=2,
+                 scheduler=None, max_retries=2):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.port = port
+        self.iana_server = iana_server
+        self.max_referrals = max_referrals
+        self.scheduler = scheduler or ServerScheduler()
+        self.max_retries = max_retries
+        # Optional LookupMetrics, None keeps instrumentation off
+        self.metrics = None
+        # TLD -> registry WHOIS server, learned from IANA once per process
+        self.tld_servers = {}
+        self._tld_lookups = {}
+    
+    async def query_server(self, server, query):
+        """Query a WHOIS server within its rate limit, retrying after throttling"""
+        for attempt in range(self.max_retries + 1):
+            async with self.scheduler.slot(server):
+                sent = time.perf_counter()
+                try:
+                    text = await self._send_query(server, query)
+                except (ConnectionResetError, ConnectionRefusedError) as e:
+                    if self.metrics:
+                        self.metrics.record_error(server, e)
+                    self.scheduler.record_throttle(server)
+                    if attempt == self.max_retries:
+                        raise
+                    continue
+                except Exception as e:
+                    if self.metrics:
+                        self.metrics.record_error(server, e)
+                    raise
+                
+                if self.metrics:
+                    self.metrics.observe_query(server, time.perf_counter() - sent)
+                if not self.scheduler.is_throttled(text):
+                    self.scheduler.record_success(server)
+                    return text
+                if self.metrics:
+                    self.metrics.record_throttle(server)
+                self.scheduler.record_throttle(server)
+        raise WHOISThrottledError(f"{server} rate limit exceeded")
+    
+    async def _send_query(self, server, query):
+        """Send one query to a WHOIS server and read the full response"""
+        import asyncio
+        started = time.perf_counter()
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(server, self.port), self.connect_timeout)
+            if self.metrics:
+                self.metrics.observe_phase('connect', time.perf_counter() - started)
+        except asyncio.TimeoutError:
+            raise WHOISTimeoutError(f"Connection to {server} timed out")
+        
+        try:
+            writer.write(self.QUERY_FORMATS.get(server, '{}').format(query).encode() + b"\r\n")
+            await writer.drain()
+            data = await asyncio.wait_for(reader.read(), self.read_timeout)
+        except asyncio.TimeoutError:
+            raise WHOISTimeoutError(f"Reading from {server} timed out")
+        finally:
+            writer.close()
+        return data.decode('utf-8', errors='replace')
+    
+    async def _timed(self, phase, awaitable):
+        """Await something, recording its duration as a lookup phase"""
+        if not self.metrics:
+            return await awaitable
+        started = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.metrics.observe_phase(phase, time.perf_counter() - started)
+    
+    async def find_tld_server(self, tld):
+        """Ask IANA which server is authoritative for a TLD"""
+        import asyncio
+        if tld not in self.tld_servers:
+            # Concurrent lookups under a new TLD share a single IANA query
+            if tld not in self._tld_lookups:
+                self._tld_lookups[tld] = asyncio.ensure_future(self._ask_iana(tld))
+            try:
+                self.tld_servers[tld] = await asyncio.shield(self._tld_lookups[tld])
+            finally:
+                self._tld_lookups.pop(tld, None)
+            self.scheduler.claim(self.tld_servers[tld])
+        return self.tld_servers[tld]
+    
+    async def _ask_iana(self, tld):
+        """Query IANA for the registry server of a TLD"""
+        text = await self._timed('hop_iana', self.query_server(self.iana_server, tld))
+        match = self.IANA_REFER.search(text)
+        if not match:
+            raise WHOISLookupError(f"No WHOIS server known for .{tld}")
+        return match.group(1).lower()
+    
+    async def query(self, domain):
+        """Query a domain, following referrals from IANA to the registrar"""
+        try:
+            query = domain.encode('idna').decode('ascii')
+        except UnicodeError:
+            query = domain
+        
+        server = await self.find_tld_server(query.rsplit('.', 1)[-1])
+        text = await self._timed('hop_registry', self.query_server(server, query))
+        servers = [server]
+        
+        # Follow registry -> registrar referrals
+        for _ in range(self.max_referrals):
+            match = self.REGISTRAR_REFER.search(text)
+            if not match:
+                break
+            referral = match.group(1).lower().split('://')[-1].strip('/')
+            if referral in servers:
+                break
+            try:
+                text += "\n" + await self._timed('hop_registrar', self.query_server(referral, query))
+            except (OSError, WHOISLookupError):
+                # The registry answer is still usable without the registrar one
+                break
+            servers.append(referral)
+        
+        return WHOISResponse(domain, text, servers)
+
+# Registry answers meaning the domain is not registered
+NOT_FOUND_PATTERN = re.compile(r'no match|not found|no data found|no entries found|status:\s*(?:free|available)', re.IGNORECASE)
+
+# ========== METRICS ==========
+class Histogram:
+    """Cumulative latency histogram with Prometheus style buckets"""
+    BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+    
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+    
+    def observe(self, seconds):
+        """Record one duration"""
+        self.counts[bisect.bisect_left(self.BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+    
+    def quantile(self, fraction):
+        """Estimate a quantile as the upper bound of its bucket"""
+        target = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.BUCKETS + (float('inf'),), self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float('inf')
+
+class LookupMetrics:
+    """Per-phase timings and per-server counters for WHOIS lookups"""
+    def __init__(self):
+        self.phases = defaultdict(Histogram)
+        self.servers = defaultdict(Histogram)
+        self.errors = Counter()
+        self.timeouts = Counter()
+        self.throttled = Counter()
+        self.lookups = Counter()
+        self.cache_hits = Counter()
+        self.cache_misses = Counter()
+    
+    def observe_phase(self, phase, seconds):
+        """Record the duration of one lookup phase"""
+        self.phases[phase].observe(seconds)
+    
+    def observe_query(self, server, seconds):
+        """Record the network time of one query to a server"""
+        self.servers[server].observe(seconds)
+    
+    def record_error(self, server, error):
+        """Count a failed query by server and error class"""
+        import asyncio
+        self.errors[server, type(error).__name__] += 1
+        if isinstance(error, (WHOISTimeoutError, asyncio.TimeoutError)):
+            self.timeouts[server] += 1
+    
+    def record_throttle(self, server):
+        """Count a rate limit refusal from a server"""
+        self.throttled[server] += 1
+    
+    @staticmethod
+    def _label(value):
+        """Escape a Prometheus label value"""
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    
+    def _histogram_lines(self, name, label, histograms):
+        """Render a family of histograms in Prometheus text format"""
+        lines = [f"# TYPE {name} histogram"]
+        for key, histogram in sorted(histograms.items()):
+            labels = f'{label}="{self._label(key)}"'
+            cumulative = 0
+            for bound, count in zip(histogram.BUCKETS, histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f'{name}_sum{{{labels}}} {histogram.sum:.6f}')
+            lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+        return lines
+    
+    def to_prometheus(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = self._histogram_lines('whois_phase_duration_seconds', 'phase', self.phases)
+        lines += self._histogram_lines('whois_server_query_duration_seconds', 'server', self.servers)
+        
+        lines.append("# TYPE whois_server_errors_total counter")
+        for (server, error_class), count in sorted(self.errors.items()):
+            lines.append(f'whois_server_errors_total{{server="{self._label(server)}",class="{self._label(error_class)}"}} {count}')
+        for name, counter in (('whois_server_timeouts_total', self.timeouts), ('whois_server_throttled_total', self.throttled)):
+            lines.append(f"# TYPE {name} counter")
+            for server, count in sorted(counter.items()):
+                lines.append(f'{name}{{server="{self._label(server)}"}} {count}')
+        
+        lines.append("# TYPE whois_lookups_total counter")
+        for outcome, count in sorted(self.lookups.items()):
+            lines.append(f'whois_lookups_total{{outcome="{outcome}"}} {count}')
+        for name, counter in (('whois_cache_hits_total', self.cache_hits), ('whois_cache_misses_total', self.cache_misses)):
+            lines.append(f"# TYPE {name} counter")
+            for server, count in sorted(counter.items()):
+                lines.append(f'{name}{{server="{self._label(server)}"}} {count}')
+        return "\n".join(lines) + "\n"
+    
+    def write_prometheus(self, path):
+        """Atomically write the metrics to a file for a textfile collector"""
+        temporary = f"{path}.tmp"
+        with open(temporary, 'w') as f:
+            f.write(self.to_prometheus())
+        os.replace(temporary, path)
+    
+    def summary_lines(self):
+        """Build the end-of-run timing table"""
+        lines = [f"{'PHASE / SERVER':<34}{'COUNT':>8}{'MEAN ms':>10}{'p50 ms':>10}{'p99 ms':>10}"]
+        for title, histograms in (('', self.phases), ('server ', self.servers)):
+            for key, histogram in sorted(histograms.items()):
+                if not histogram.count:
+                    continue
+                lines.append(f"{(title + key)[:33]:<34}{histogram.count:>8}{histogram.sum / histogram.count * 1000:>10.1f}"
+                             f"{'<=' + format(histogram.quantile(0.5) * 1000, 'g'):>10}"
+                             f"{'<=' + format(histogram.quantile(0.99) * 1000, 'g'):>10}")
+        
+        for server in sorted({server for server, _ in self.errors} | set(self.throttled)):
+            errors = ", ".join(f"{error_class} {count}" for (name, error_class), count in sorted(self.errors.items())
+                               if name == server)
+            lines.append(f"{server}: errors [{errors or 'none'}], timeouts {self.timeouts[server]}, "
+                         f"throttled {self.throttled[server]}")
+        lines.append(f"cache: {sum(self.cache_hits.values())} hits, {sum(self.cache_misses.values())} misses")
+        for server in sorted(set(self.cache_hits) | set(self.cache_misses)):
+            lines.append(f"  {server}: {self.cache_hits[server]} hits, {self.cache_misses[server]} misses")
+        return lines
+
+# ========== RESPONSE CACHE ==========
+class WHOISCache:
+    """Persistent WHOIS response cache that several processes can share"""
+    DEFAULT_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'whois-colorful', 'responses.sqlite3')
+    
+    # Responses meaning the domain is not registered get a shorter TTL
+    NOT_FOUND = NOT_FOUND_PATTERN
+    
+    # Run LRU eviction once per this many writes instead of on every write
+    EVICT_EVERY = 1000
+    
+    # Access times only need to be this precise for LRU eviction, so most hits skip the write
+    ACCESS_RESOLUTION = 3600
+    
+    def __init__(self, path=DEFAULT_PATH, ttl=24 * 3600, negative_ttl=3600, max_entries=100000):
+        import sqlite3
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # WAL mode lets readers and a writer from different processes work side by side
+        self.db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute("""CREATE TABLE IF NOT EXISTS responses (
+            domain TEXT PRIMARY KEY,
+            text TEXT NOT NULL,
+            servers TEXT NOT NULL,
+            expires REAL NOT NULL,
+            accessed REAL NOT NULL)""")
+        self.db.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)')
+    
+    @staticmethod
+    def normalize(domain):
+        """Normalize a domain into a cache key"""
+        return domain.strip().lower().rstrip('.')
+    
+    def get(self, domain):
+        """Return a cached response, or None when missing or expired"""
+        import json
+        key = self.normalize(domain)
+        now = time.time()
+        row = self.db.execute('SELECT text, servers, expires, accessed FROM responses WHERE domain = ?', (key,)).fetchone()
+        if row is None or row[2] < now:
+            self.misses += 1
+            return None
+        
+        if now - row[3] >= self.ACCESS_RESOLUTION:
+            self.db.execute('UPDATE responses SET accessed = ? WHERE domain = ?', (now, key))
+        self.hits += 1
+        return WHOISResponse(domain, row[0], json.loads(row[1]))
+    
+    def put(self, response):
+        """Store a raw response with a TTL based on whether the domain exists"""
+        import json
+        now = time.time()
+        ttl = self.negative_ttl if self.NOT_FOUND.search(response.text) else self.ttl
+        self.db.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)',
+                        (self.normalize(response.domain), response.text, json.dumps(response.servers), now + ttl, now))
+        self._writes += 1
+        if self._writes % self.EVICT_EVERY == 0:
+            self.evict()
+    
+    def evict(self):
+        """Drop least recently used entries beyond the size limit"""
+        self.db.execute('DELETE FROM responses WHERE domain IN '
+                        '(SELECT domain FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)',
+                        (self.max_entries,))
+    
+    def close(self):
+        """Evict down to the size limit and close the database"""
+        # Read-only runs such as a single cache hit cannot have grown the cache
+        if self._writes:
+            self.evict()
+        self.db.close()
+
+# ========== DNS RESOLVER ==========
+class AsyncResolver:
+    """Concurrent A/AAAA resolver with an in-process TTL cache"""
+    def __init__(self, timeout=5, ttl=300, negative_ttl=60, lookup=None, max_threads=64):
+        self.timeout = timeout
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        # Pluggable backend: async lookup(host) -> (ipv4, ipv6, ttl or None)
+        self.lookup = lookup or self.system_lookup
+        self.max_threads = max_threads
+        self._executor = None
+        self.cache = {}
+        self._inflight = {}
+    
+    async def system_lookup(self, host):
+        """Resolve A and AAAA records together with the system resolver"""
+        import asyncio
+        import concurrent.futures
+        import socket
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(self.max_threads, thread_name_prefix='resolver')
+        loop = asyncio.get_running_loop()
+        infos = await loop.run_in_executor(self._executor, socket.getaddrinfo, host, None, 0, socket.SOCK_STREAM)
+        ipv4 = []
+        ipv6 = []
+        for family, _, _, _, sockaddr in infos:
+            addresses = ipv4 if family == socket.AF_INET else ipv6
+            if sockaddr[0] not in addresses:
+                addresses.append(sockaddr[0])
+        # getaddrinfo does not expose record TTLs, the default TTL applies
+        return ipv4, ipv6, None
+    
+    async def resolve(self, host):
+        """Return all (ipv4, ipv6) addresses of a host, cached by TTL"""
+        import asyncio
+        host = host.lower().rstrip('.')
+        cached = self.cache.get(host)
+        if cached and cached[0] > time.monotonic():
+            return cached[1], cached[2]
+        
+        # Concurrent requests for the same host share one lookup
+        if host not in self._inflight:
+            self._inflight[host] = asyncio.ensure_future(self._resolve_uncached(host))
+        try:
+            return await asyncio.shield(self._inflight[host])
+        finally:
+            self._inflight.pop(host, None)
+    
+    async def _resolve_uncached(self, host):
+        """Run the backend lookup and store the answer"""
+        import asyncio
+        try:
+            ipv4, ipv6, ttl = await asyncio.wait_for(self.lookup(host), self.timeout)
+        except (OSError, UnicodeError, asyncio.TimeoutError):
+            ipv4, ipv6, ttl = [], [], None
+        
+        if ttl is None:
+            ttl = self.ttl if ipv4 or ipv6 else self.negative_ttl
+        self.cache[host] = (time.monotonic() + ttl, ipv4, ipv6)
+        return ipv4, ipv6
+    
+    def close(self):
+        """Stop the resolver threads"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+# ========== EXPIRY MONITOR ==========
+def days_until_expiry(whois_data):
+    """Return whole days until a domain expires, or None when unknown"""
+    exp_date = getattr(whois_data, 'expiration_date', None)
+    if isinstance(exp_date, list):
+        exp_date = exp_date[0] if exp_date else None
+    if not isinstance(exp_date, datetime):
+        return None
+    return (exp_date - datetime.now(exp_date.tzinfo)).days
+
+class ExpiryMonitor:
+    """Local state of each monitored domain's last known expiry and registrar"""
+    DAY = 24 * 3600
+    
+    # Domains this close to or past expiry are checked daily, the rest at most monthly
+    WATCH_DAYS = 30
+    MAX_INTERVAL_DAYS = 30
+    
+    def __init__(self, path):
+        import sqlite3
+        self.not_due = 0
+        self.unchanged = 0
+        self.changed = 0
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute("""CREATE TABLE IF NOT EXISTS domains (
+            domain TEXT PRIMARY KEY,
+            expiration_date TEXT,
+            registrar TEXT,
+            checked REAL NOT NULL,
+            next_check REAL NOT NULL)""")
+    
+    def is_due(self, domain):
+        """Check whether a domain needs to be queried again"""
+        row = self.db.execute('SELECT next_check FROM domains WHERE domain = ?', (domain.lower(),)).fetchone()
+        if row is not None and row[0] > time.time():
+            self.not_due += 1
+            return False
+        return True
+    
+    def next_interval(self, days_left):
+        """Work out how long to wait before the next check"""
+        if days_left is None:
+            # Registries such as DENIC and SIDN never publish an expiry date
+            return self.MAX_INTERVAL_DAYS * self.DAY
+        if days_left <= self.WATCH_DAYS:
+            return self.DAY
+        # Never sleep past the moment the domain enters the daily window
+        return min(self.MAX_INTERVAL_DAYS, days_left - self.WATCH_DAYS) * self.DAY
+    
+    def update(self, domain, whois_data):
+        """Store fresh data and report whether expiry or registrar changed"""
+        key = domain.lower()
+        expiration = _iso(whois_data.get('expiration_date'))
+        registrar = _first(whois_data.get('registrar'))
+        now = time.time()
+        
+        previous = self.db.execute('SELECT expiration_date, registrar FROM domains WHERE domain = ?', (key,)).fetchone()
+        self.db.execute('INSERT OR REPLACE INTO domains VALUES (?, ?, ?, ?, ?)',
+                        (key, expiration, registrar, now, now + self.next_interval(days_until_expiry(whois_data))))
+        
+        if previous == (expiration, registrar):
+            self.unchanged += 1
+            return False
+        self.changed += 1
+        return True
+    
+    def close(self):
+        """Close the state database"""
+        self.db.close()
+
+# ========== SNAPSHOT STORE ==========
+class SnapshotStore:
+    """Append-only history of each domain's raw responses and normalized records"""
+    # Lines that change on every query although the domain did not
+    VOLATILE = re.compile(r'>>>.*<<<|^last updated on .*$|^[ \t]*whois lookup made (?:at|on) .*$', re.IGNORECASE | re.MULTILINE)
+    
+    # Record fields kept with every snapshot and compared by diff
+    FIELDS = ('registrar', 'whois_server', 'creation_date', 'expiration_date', 'updated_date',
+              'name_servers', 'status', 'dnssec')
+    
+    def __init__(self, directory):
+        import sqlite3
+        self.directory = directory
+        self.blobs = os.path.join(directory, 'blobs')
+        os.makedirs(self.blobs, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(directory, 'index.sqlite3'), timeout=30, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        # One row per run of identical responses, so unchanged lookups only move last_seen
+        self.db.execute("""CREATE TABLE IF NOT EXISTS snapshots (
+            domain TEXT NOT NULL,
+            first_seen REAL NOT NULL,
+            last_seen REAL NOT NULL,
+            digest TEXT NOT NULL,
+            record TEXT NOT NULL)""")
+        self.db.execute('CREATE INDEX IF NOT EXISTS snapshots_domain ON snapshots (domain, first_seen)')
+        self.added = 0
+        self.unchanged = 0
+    
+    @classmethod
+    def digest(cls, text):
+        """Hash a response without its volatile lines"""
+        import hashlib
+        return hashlib.sha256(cls.VOLATILE.sub('', text).encode()).hexdigest()
+    
+    def blob_path(self, digest):
+        """Path of the compressed response stored under a digest"""
+        return os.path.join(self.blobs, digest[:2], digest[2:])
+    
+    def add(self, domain, response, whois_data):
+        """Record a lookup and report whether it differs from the latest snapshot"""
+        import json
+        import zlib
+        key = domain.lower()
+        digest = self.digest(response.text)
+        now = time.time()
+        latest = self.db.execute('SELECT rowid, digest FROM snapshots WHERE domain = ? ORDER BY first_seen DESC LIMIT 1',
+                                 (key,)).fetchone()
+        if latest and latest[1] == digest:
+            self.db.execute('UPDATE snapshots SET last_seen = ? WHERE rowid = ?', (now, latest[0]))
+            self.unchanged += 1
+            return False
+        
+        # Responses are content addressed, so a blob is written once however often it is seen
+        path = self.blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temporary = f"{path}.{os.getpid()}.tmp"
+            with open(temporary, 'wb') as f:
+                f.write(zlib.compress(response.text.encode(), 9))
+            os.replace(temporary, path)
+        
+        record = build_record(key, whois_data)
+        # Registries do not keep list order stable, sorting keeps diffs to real changes
+        snapshot = {field: sorted(record[field]) if isinstance(record[field], list) else record[field]
+                    for field in self.FIELDS}
+        self.db.execute('INSERT INTO snapshots VALUES (?, ?, ?, ?, ?)',
+                        (key, now, now, digest, json.dumps(snapshot, ensure_ascii=False)))
+        self.added += 1
+        return True
+    
+    def history(self, domain):
+        """Return (first_seen, last_seen, digest, record) for every snapshot of a domain, oldest first"""
+        import json
+        rows = self.db.execute('SELECT first_seen, last_seen, digest, record FROM snapshots '
+                               'WHERE domain = ? ORDER BY first_seen', (domain.lower(),))
+        return [(first_seen, last_seen, digest, json.loads(record)) for first_seen, last_seen, digest, record in rows]
+    
+    def raw(self, digest):
+        """Return the raw response stored under a digest"""
+        import zlib
+        with open(self.blob_path(digest), 'rb') as f:
+            return zlib.decompress(f.read()).decode()
+    
+    @classmethod
+    def compare(cls, old, new):
+        """List (field, old value, new value) for every field that differs"""
+        return [(field, old.get(field), new.get(field)) for field in cls.FIELDS if old.get(field) != new.get(field)]
+    
+    def changes(self, domain):
+        """Yield (time, field, old value, new value) for every change between consecutive snapshots"""
+        history = self.history(domain)
+        for (_, _, _, old), (first_seen, _, _, new) in zip(history, history[1:]):
+            for field, before, after in self.compare(old, new):
+                yield first_seen, field, before, after
+    
+    def close(self):
+        """Close the index database"""
+        self.db.close()
+
+# ========== BATCH CHECKPOINT ==========
+class BatchCheckpoint:
+    """Compact progress record that lets an interrupted batch resume"""
+    SAVE_INTERVAL = 5
+    
+    def __init__(self, path, source=None):
+        import json
+        self.path = path
+        self.source = source
+        # Every input position below the low watermark is finished; only the
+        # positions finished out of order above it are kept, so memory stays flat
+        self.low_watermark = 0
+        self.done = set()
+        # position -> [domain, attempts] for failures waiting on a retry
+        self.retries = {}
+        self.resumed = False
+        self._saved = time.monotonic()
+        
+        if os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            if source and state.get('source') != source:
+                raise ValueError(f"checkpoint {path} belongs to {state.get('source')}, not {source}")
+            self.low_watermark = state['low_watermark']
+            self.done = set(state['done'])
+            self.retries = {int(index): retry for index, retry in state['retries'].items()}
+            self.resumed = True
+    
+    def is_done(self, index):
+        """Check whether an input position was finished or deferred in an earlier run"""
+        return index < self.low_watermark or index in self.done
+    
+    def mark_done(self, index):
+        """Record a finished input position"""
+        self.retries.pop(index, None)
+        self._advance(index)
+    
+    def defer(self, index, domain, attempts):
+        """Record a failed position that waits in the retry queue"""
+        self.retries[index] = [domain, attempts]
+        self._advance(index)
+    
+    def _advance(self, index):
+        if index >= self.low_watermark:
+            self.done.add(index)
+            while self.low_watermark in self.done:
+                self.done.remove(self.low_watermark)
+                self.low_watermark += 1
+        if time.monotonic() - self._saved >= self.SAVE_INTERVAL:
+            self.save()
+    
+    def save(self):
+        """Atomically write the checkpoint"""
+        import json
+        temporary = f"{self.path}.tmp"
+        with open(temporary, 'w') as f:
+            json.dump({'source': self.source, 'low_watermark': self.low_watermark,
+                       'done': sorted(self.done), 'retries': self.retries}, f)
+        os.replace(temporary, self.path)
+        self._saved = time.monotonic()
+    
+    def remove(self):
+        """Delete the checkpoint once the whole batch has finished"""
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.path)
+
+# ========== WHOIS RESPONSE PARSER ==========
+class WHOISRecord(dict):
+    """Parsed WHOIS fields with attribute access like python-whois entries"""
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return self.get(name)
+
+class WHOISParser:
+    """Single pass parser turning raw port 43 text into WHOIS fields"""
+    # Labels used by ICANN style registries and registrars, lowercased
+    COMMON_FIELDS = {
+        'domain name': 'domain_name',
+        'domain': 'domain_name',
+        'registrar': 'registrar',
+        'sponsoring registrar': 'registrar',
+        'registrar name': 'registrar',
+        'registrar url': 'registrar_url',
+        'referral url': 'registrar_url',
+        'registrar whois server': 'whois_server',
+        'whois server': 'whois_server',
+        'creation date': 'creation_date',
+        'created': 'creation_date',
+        'created on': 'creation_date',
+        'registered on': 'creation_date',
+        'registration time': 'creation_date',
+        'registry expiry date': 'expiration_date',
+        'registrar registration expiration date': 'expiration_date',
+        'expiration date': 'expiration_date',
+        'expiry date': 'expiration_date',
+        'expires on': 'expiration_date',
+        'updated date': 'updated_date',
+        'last updated': 'updated_date',
+        'last modified': 'updated_date',
+        'name server': 'name_servers',
+        'nameserver': 'name_servers',
+        'nserver': 'name_servers',
+        'name servers': 'name_servers',
+        'domain status': 'status',
+        'status': 'status',
+        'registrar abuse contact email': 'emails',
+        'registrant email': 'emails',
+        'admin email': 'emails',
+        'tech email': 'emails',
+        'dnssec': 'dnssec',
+        'registrant organization': 'org',
+        'registrant organisation': 'org',
+        'registrant state/province': 'state',
+        'registrant city': 'city',
+        'registrant country': 'country',
+    }
+    
+    # Registry specific labels layered on top of the common ones
+    TLD_FIELDS = {
+        'uk': {'registration status': 'status'},
+        'de': {'changed': 'updated_date'},
+        'ru': {'paid-till': 'expiration_date', 'state': 'status', 'org': 'org'},
+        'su': {'paid-till': 'expiration_date', 'state': 'status', 'org': 'org'},
+        'jp': {'registrant': 'org', 'last update': 'updated_date', 'email': 'emails'},
+        'fr': {'last-update': 'updated_date', 'eppstatus': 'status', 'e-mail': 'emails'},
+        'nl': {'domain nameservers': 'name_servers'},
+        'br': {'owner': 'org', 'expires': 'expiration_date', 'changed': 'updated_date', 'e-mail': 'emails'},
+    }
+    
+    LIST_FIELDS = ('name_servers', 'status', 'emails')
+    DATE_FIELDS = ('creation_date', 'expiration_date', 'updated_date')
+    EMPTY_FIELDS = (
+        'domain_name', 'registrar', 'registrar_url', 'whois_server', 'creation_date', 'expiration_date',
+        'updated_date', 'dnssec', 'org', 'state', 'city', 'country',
+    )
+    
+    # Fallback date layouts for registries that do not use ISO 8601, and for
+    # ISO 8601 forms that datetime.fromisoformat only accepts from Python 3.11
+    DATE_FORMATS = [
+        '%d-%b-%Y', '%Y/%m/%d', '%Y/%m/%d %H:%M:%S', '%Y.%m.%d', '%d.%m.%Y',
+        '%d/%m/%Y', '%Y-%m-%d %H:%M:%S', '%Y%m%d', '%d-%b-%Y %H:%M:%S',
+        '%Y-%m-%dT%H:%M:%S%z', '%Y-%m-%dT%H:%M:%S.%f%z', '%Y-%m-%d %H:%M:%S%z', '%Y-%m-%dT%H:%M:%S.%f',
+    ]
+    
     def __init__(self):
+        # Merged label maps are built once per TLD and reused for every response
+        self.field_maps = {tld: {**self.COMMON_FIELDS, **fields} for tld, fields in self.TLD_FIELDS.items()}
+        self._last_date_format = self.DATE_FORMATS[0]
+    
+    def parse_date(self, value):
+        """Convert a registry date string to a naive UTC datetime"""
+        value = value.split(' (')[0].strip()
+        if not value[:1].isdigit():
+            # Free text such as "before Aug-1996" is kept as is
+            return value
+        try:
+            parsed = datetime.fromisoformat(value[:-1] + '+00:00' if value.endswith('Z') else value)
+        except ValueError:
+            parsed = None
+            # Most responses of a sweep share one layout, so try the last hit first
+            for date_format in [self._last_date_format] + [f for f in self.DATE_FORMATS if f != self._last_date_format]:
+                try:
+                    parsed = datetime.strptime(value, date_format)
+                except ValueError:
+                    continue
+                self._last_date_format = date_format
+                break
+            if parsed is None:
+                return value
+        
+        if parsed.tzinfo is not None:
+            parsed = (parsed - parsed.utcoffset()).replace(tzinfo=None)
+        return parsed
+    
+    def parse(self, domain, text):
+        """Parse a raw WHOIS response in a single pass over its lines"""
+        fields = self.field_maps.get(domain.rsplit('.', 1)[-1].lower(), self.COMMON_FIELDS)
+        record = WHOISRecord.fromkeys(self.EMPTY_FIELDS)
+        for field in self.LIST_FIELDS:
+            record[field] = []
+        
+        # Field whose value continues on the following lines indented deeper than its label
+        pending = None
+        pending_indent = 0
+        for line in text.splitlines():
+            stripped = line.lstrip()
+            indent = len(line) - len(stripped)
+            line = stripped.rstrip()
+            if not line or line[0] in '%#>':
+                pending = None
+                continue
+            
+            if pending and indent > pending_indent:
+                # Indented values such as "ns1.example.co.uk  2001:db8::1" may contain colons
+                self._add(record, pending, line)
+                continue
+            pending = None
+            
+            if line[0] == '[':
+                key, sep, value = line[1:].partition(']')
+            else:
+                key, sep, value = line.partition(':')
+            if not sep:
+                continue
+            
+            field = fields.get(key.strip().lower())
+            # Single value fields keep the registry's answer, skip later repeats early
+            if field and (field in self.LIST_FIELDS or record[field] is None):
+                value = value.strip()
+                if value:
+                    self._add(record, field, value)
+                else:
+                    pending = field
+                    pending_indent = indent
+        
+        if not record['domain_name'] and NOT_FOUND_PATTERN.search(text):
+            raise WHOISNotFoundError(f"No match for {domain}")
+        return record
+    
+    def _add(self, record, field, value):
+        """Store a value, keeping the first one for single value fields"""
+        if field in self.LIST_FIELDS:
+            values = record[field]
+            if field == 'name_servers':
+                value = value.split()[0].rstrip('.,').lower()
+            elif field == 'emails':
+                # Redacted contacts carry a sentence instead of an address
+                if '@' not in value or ' ' in value:
+                    return
+            elif field == 'status':
+                # Registry and registrar both list the same EPP codes
+                code = value.split()[0]
+                if any(status.split()[0] == code for status in values):
+                    return
+            if value not in values:
+                values.append(value)
+        elif record[field] is None:
+            record[field] = self.parse_date(value) if field in self.DATE_FIELDS else value
+
+# ========== COMPACT RECORDS ==========
+EPOCH = datetime(1970, 1, 1)
+
+def to_epoch(value):
+    """Convert a naive UTC or timezone-aware datetime to whole epoch seconds"""
+    if value.tzinfo:
+        return int(value.timestamp())
+    return (value - EPOCH) // timedelta(seconds=1)
+
+def from_epoch(seconds):
+    """Convert epoch seconds back to a naive UTC datetime"""
+    return EPOCH + timedelta(seconds=seconds)
+
+class CompactRecord:
+    """Memory-lean WHOIS fields: interned strings, shared tuples and epoch dates"""
+    STRING_FIELDS = ('domain_name', 'registrar', 'registrar_url', 'whois_server', 'dnssec', 'org', 'state', 'city', 'country')
+    LIST_FIELDS = WHOISParser.LIST_FIELDS
+    DATE_FIELDS = WHOISParser.DATE_FIELDS
+    
+    # List and date fields live in private slots and are converted on access
+    __slots__ = STRING_FIELDS + tuple(f'_{field}' for field in LIST_FIELDS + DATE_FIELDS)
+    
+    @classmethod
+    def from_record(cls, whois_data, tuples=None):
+        """Compact a WHOISRecord or python-whois result
+        
+        Name server and status sets repeat across many domains, so records
+        sharing a tuples dict store equal tuples once. The dict belongs to the
+        caller and is freed together with its records.
+        """
+        record = cls.__new__(cls)
+        for field in cls.STRING_FIELDS:
+            value = _first(whois_data.get(field))
+            if value is not None:
+                # Domain names are unique, interning them would only add overhead
+                value = str(value) if field == 'domain_name' else sys.intern(str(value))
+            setattr(record, field, value)
+        for field in cls.LIST_FIELDS:
+            items = tuple(sys.intern(item) for item in _as_list(whois_data.get(field)))
+            if tuples is not None and items:
+                items = tuples.setdefault(items, items)
+            setattr(record, f'_{field}', items or None)
+        for field in cls.DATE_FIELDS:
+            # Dates the parser could not read stay as their text
+            value = _first(whois_data.get(field))
+            setattr(record, f'_{field}', to_epoch(value) if isinstance(value, datetime) else value)
+        return record
+    
+    def __getattr__(self, name):
+        if name in self.DATE_FIELDS:
+            value = getattr(self, f'_{name}')
+            return from_epoch(value) if isinstance(value, int) else value
+        if name in self.LIST_FIELDS:
+            value = getattr(self, f'_{name}')
+            return list(value) if value else None
+        raise AttributeError(name)
+    
+    def get(self, name, default=None):
+        """Dict style access so exporters treat this like a parsed record"""
+        return getattr(self, name, default)
+
+class RecordBatch:
+    """Columnar container holding many records in flat arrays
+    
+    A lone CompactRecord is only about 4x smaller than the parsed dict,
+    because each epoch date is still its own int object; the batch stores
+    dates in flat arrays and reaches the 5x target, so result sets that are
+    held in memory (such as a sorted batch) use it.
+    """
+    # Marks a missing date in the epoch columns
+    MISSING = -2 ** 63
+    
+    def __init__(self):
+        import array
+        self.domain_names = []
+        # Every other distinct string or tuple is stored once, the columns hold its id
+        self.values = [None]
+        self.ids = {None: 0}
+        self.columns = {field: array.array('I') for field in CompactRecord.STRING_FIELDS[1:] + CompactRecord.LIST_FIELDS}
+        self.dates = {field: array.array('q') for field in CompactRecord.DATE_FIELDS}
+        # (field, row) -> date text the parser could not read
+        self.unparsed = {}
+        # Resolved addresses as value ids, and row -> message for failed lookups, which are rare
+        self.addresses = array.array('I')
+        self.errors = {}
+    
+    def __len__(self):
+        return len(self.domain_names)
+    
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+    
+    def _id(self, value):
+        if value not in self.ids:
+            self.ids[value] = len(self.values)
+            self.values.append(value)
+        return self.ids[value]
+    
+    def append(self, whois_data, domain=None, addresses=None, error=None):
+        """Add a WHOISRecord, python-whois result or CompactRecord
+        
+        A batch lookup result also keeps the queried domain, which replaces
+        the registry's spelling of the name, its addresses and its error.
+        """
+        if not isinstance(whois_data, CompactRecord):
+            # Equal tuples are shared through the value table below, not an intern table
+            whois_data = CompactRecord.from_record(whois_data or {})
+        row = len(self)
+        self.domain_names.append(domain or whois_data.domain_name)
+        self.addresses.append(self._id(tuple(map(tuple, addresses)) if addresses else None))
+        if error is not None:
+            self.errors[row] = _error_message(error)
+        for field in CompactRecord.STRING_FIELDS[1:]:
+            self.columns[field].append(self._id(getattr(whois_data, field)))
+        for field in CompactRecord.LIST_FIELDS:
+            self.columns[field].append(self._id(getattr(whois_data, f'_{field}')))
+        for field in CompactRecord.DATE_FIELDS:
+            value = getattr(whois_data, f'_{field}')
+            if isinstance(value, int):
+                self.dates[field].append(value)
+            else:
+                self.dates[field].append(self.MISSING)
+                if value is not None:
+                    self.unparsed[field, row] = value
+    
+    def __getitem__(self, row):
+        record = CompactRecord.__new__(CompactRecord)
+        record.domain_name = self.domain_names[row]
+        for field in CompactRecord.STRING_FIELDS[1:]:
+            setattr(record, field, self.values[self.columns[field][row]])
+        for field in CompactRecord.LIST_FIELDS:
+            setattr(record, f'_{field}', self.values[self.columns[field][row]])
+        for field in CompactRecord.DATE_FIELDS:
+            value = self.dates[field][row]
+            setattr(record, f'_{field}', self.unparsed.get((field, row)) if value == self.MISSING else value)
+        return record
+    
+    def result(self, row):
+        """Return (domain, whois_data, addresses, error) as a batch lookup produced them"""
+        error = self.errors.get(row)
+        return (self.domain_names[row], None if error else self[row],
+                self.values[self.addresses[row]], error)
+    
+    def order_by(self, field, reverse=False):
+        """Return row numbers sorted by a string or date field, missing values last"""
+        if field == 'domain_name':
+            value = self.domain_names.__getitem__
+        elif field in self.dates:
+            column = self.dates[field]
+            value = lambda row: None if column[row] == self.MISSING else column[row]
+        else:
+            column = self.columns[field]
+            value = lambda row: self.values[column[row]]
+        present, missing = [], []
+        for row in range(len(self)):
+            (missing if value(row) is None else present).append(row)
+        # Only rows with a value are reversed, the missing ones stay last
+        present.sort(key=value, reverse=reverse)
+        return present + missing
+
+class ColorfulWHOIS:
+    # Batch retries back off exponentially from RETRY_DELAY up to RETRY_MAX_DELAY seconds
+    RETRY_DELAY = 2
+    RETRY_MAX_DELAY = 60
+    
+    ANSI_ESCAPE = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+    
+    def __init__(self, quiet=False):
         self.version = "1.0.0"
         self.author = "Muhammad Hassnain"
-        self.colors = Colors()
+        # Quiet mode builds no ANSI strings and never sleeps
+        self.quiet = quiet
+        self.colors = PlainColors() if quiet else Colors()
+        self.client = AsyncWHOISClient()
+        self.cache = None
+        self.refresh = False
+        self.parser = WHOISParser()
+        self.use_python_whois = False
+        self.resolver = AsyncResolver()
+        self.monitor = None
+        self.snapshots = None
+        self.metrics = None
+        self.show_timings = False
         
     def animated_banner(self):
         """Display animated banner"""
+        if self.quiet:
+            return
+        
         banner_lines = [
             f"{self.colors.BOLD_MAGENTA}╔════════════════════════════════════════════════════════════════╗",
             f"{self.colors.BOLD_CYAN}║{self.colors.BOLD_YELLOW}        🌈 WHOIS DOMAIN LOOKUP TOOL - COLORFUL EDITION 🌈        {self.colors.BOLD_CYAN}║",
@@ -98,6 +1315,9 @@ class ColorfulWHOIS:
     
     def loading_animation(self, text, duration=1):
         """Show loading animation"""
+        if self.quiet:
+            return
+        
         animation = "|/-\\"
         for i in range(20):
             time.sleep(duration/20)
@@ -107,14 +1327,21 @@ class ColorfulWHOIS:
     
     def create_gradient_text(self, text, colors):
         """Create gradient colored text"""
+        if self.quiet:
+            return text
+        
         result = ""
         for i, char in enumerate(text):
             color = colors[i % len(colors)]
             result += f"{color}{char}{self.colors.ENDC}"
         return result
     
-    def display_domain_header(self, domain):
-        """Display colorful domain header"""
+    def notify(self, message):
+        """Print a status message, kept off stdout in quiet mode"""
+        print(message, file=sys.stderr if self.quiet else sys.stdout)
+    
+    def build_domain_header(self, domain):
+        """Build colorful domain header"""
         gradient_colors = [self.colors.RED, self.colors.YELLOW, self.colors.GREEN, self.colors.CYAN, self.colors.BLUE, self.colors.MAGENTA]
         styled_domain = self.create_gradient_text(domain, gradient_colors)
         
@@ -122,26 +1349,105 @@ class ColorfulWHOIS:
 {self.colors.BOLD_MAGENTA}┌─{self.colors.BOLD_CYAN}─────────────────────────────────────────────────────{self.colors.BOLD_MAGENTA}─┐
 {self.colors.BOLD_MAGENTA}│{self.colors.BOLD_YELLOW}  {self.colors.INFO_ICON} TARGET DOMAIN: {styled_domain}{self.colors.BOLD_YELLOW}{' ' * (30 - len(domain))}{self.colors.BOLD_MAGENTA}│
 {self.colors.BOLD_MAGENTA}└─{self.colors.BOLD_CYAN}─────────────────────────────────────────────────────{self.colors.BOLD_MAGENTA}─┘{self.colors.ENDC}"""
-        print(header)
+        return header
+    
+    def display_domain_header(self, domain):
+        """Display colorful domain header"""
+        print(self.build_domain_header(domain))
+    
+    def clean_domain(self, domain):
+        """Reduce a URL or host name to the registrable domain to query"""
+        return normalize_domain(domain)
+    
+    def parse_response(self, response):
+        """Parse a raw WHOIS response into WHOIS fields"""
+        if self.use_python_whois:
+            # python-whois and its dependencies are only loaded when asked for
+            import whois
+            try:
+                entry = whois.parser.WhoisEntry.load(response.domain, response.text)
+            except whois.parser.PywhoisError as e:
+                raise WHOISNotFoundError(f"No match for {response.domain}") from e
+        else:
+            entry = self.parser.parse(response.domain, response.text)
+        if not entry.get('whois_server'):
+            entry['whois_server'] = response.servers[-1]
+        return entry
+    
+    def cached_response(self, domain):
+        """Return the cached raw response for a domain, or None"""
+        if not self.cache or self.refresh:
+            return None
+        metrics = self.metrics
+        started = time.perf_counter()
+        response = self.cache.get(domain)
+        if metrics:
+            metrics.observe_phase('cache', time.perf_counter() - started)
+            if response is not None:
+                metrics.cache_hits[response.servers[-1]] += 1
+        return response
+    
+    async def fetch_response(self, domain):
+        """Query the WHOIS servers for a domain and cache the answer"""
+        # Misses are counted for the server that answered, or "none" when the lookup failed
+        server = 'none'
+        try:
+            response = await self.client.query(domain)
+            server = response.servers[-1]
+        finally:
+            if self.metrics and self.cache and not self.refresh:
+                self.metrics.cache_misses[server] += 1
+        if self.cache:
+            self.cache.put(response)
+        return response
+    
+    def finish_response(self, domain, response, fetched):
+        """Parse a raw response and record freshly fetched ones in the snapshot history"""
+        started = time.perf_counter()
+        whois_data = self.parse_response(response)
+        if self.metrics:
+            self.metrics.observe_phase('parse', time.perf_counter() - started)
+        # A cache hit says nothing new about the registry, so it must not move last_seen
+        if self.snapshots and fetched:
+            self.snapshots.add(domain, response, whois_data)
+        return whois_data
+    
+    async def query_domain_async(self, domain):
+        """Perform a WHOIS query on the running event loop"""
+        response = self.cached_response(domain)
+        # Cache hits never touch the network
+        fetched = response is None
+        if fetched:
+            response = await self.fetch_response(domain)
+        return self.finish_response(domain, response, fetched)
+    
+    def query_domain(self, domain):
+        """Perform a raw WHOIS query without any animation"""
+        response = self.cached_response(domain)
+        # Cache hits are answered without starting an event loop
+        fetched = response is None
+        if fetched:
+            import asyncio
+            response = asyncio.run(self.fetch_response(domain))
+        return self.finish_response(domain, response, fetched)
     
     def lookup_domain(self, domain):
         """Perform WHOIS lookup with animation"""
         try:
             # Clean domain
-            domain = domain.replace('http://', '').replace('https://', '').replace('www.', '')
-            domain = domain.split('/')[0]
+            domain = self.clean_domain(domain)
             
             self.display_domain_header(domain)
             self.loading_animation(f"{self.colors.MAGIC_ICON} Performing WHOIS magic on {domain}...")
             
             # Perform lookup
-            w = whois_lib.whois(domain)
+            w = self.query_domain(domain)
             
-            print(f"{self.colors.GREEN}{self.colors.BOLD}{self.colors.SUCCESS_ICON} WHOIS lookup completed successfully!{self.colors.ENDC}\n")
+            self.notify(f"{self.colors.GREEN}{self.colors.BOLD}{self.colors.SUCCESS_ICON} WHOIS lookup completed successfully!{self.colors.ENDC}\n")
             return w
             
         except Exception as e:
-            print(f"{self.colors.RED}{self.colors.BOLD}{self.colors.ERROR_ICON} Error: {str(e)}{self.colors.ENDC}")
+            self.notify(f"{self.colors.RED}{self.colors.BOLD}{self.colors.ERROR_ICON} Error: {str(e)}{self.colors.ENDC}")
             return None
     
     def format_section_header(self, title, icon):
@@ -297,30 +1603,29 @@ class ColorfulWHOIS:
         
         return "\n".join(output)
     
+    def resolve_addresses(self, domain):
+        """Resolve a domain to lists of IPv4 and IPv6 addresses"""
+        import asyncio
+        return asyncio.run(self.resolver.resolve(self.clean_domain(domain)))
+    
+    def format_ip_information(self, addresses):
+        """Format resolved addresses with colorful output"""
+        ipv4, ipv6 = addresses
+        output = []
+        output.append(self.format_section_header("IP INFORMATION", "🌍"))
+        for ip in ipv4:
+            output.append(self.format_key_value("IPv4 Address", ip, self.colors.BOLD_CYAN, self.colors.BOLD_GREEN, 1))
+        for ip in ipv6:
+            output.append(self.format_key_value("IPv6 Address", ip, self.colors.BOLD_CYAN, self.colors.BOLD_GREEN, 1))
+        output.append(f"{self.colors.BOLD_MAGENTA}└" + "─" * 58 + "┘" + f"{self.colors.ENDC}")
+        return "\n".join(output)
+    
     def get_ip_information(self, domain):
         """Get IP information with colorful output"""
-        try:
-            domain = domain.replace('http://', '').replace('https://', '').replace('www.', '')
-            domain = domain.split('/')[0]
-            ip = socket.gethostbyname(domain)
-            
-            output = []
-            output.append(self.format_section_header("IP INFORMATION", "🌍"))
-            output.append(self.format_key_value("IPv4 Address", ip, self.colors.BOLD_CYAN, self.colors.BOLD_GREEN, 1))
-            
-            # Try to get IPv6
-            try:
-                ipv6_info = socket.getaddrinfo(domain, None, socket.AF_INET6)
-                if ipv6_info:
-                    ipv6 = ipv6_info[0][4][0]
-                    output.append(self.format_key_value("IPv6 Address", ipv6, self.colors.BOLD_CYAN, self.colors.BOLD_GREEN, 1))
-            except:
-                pass
-            
-            output.append(f"{self.colors.BOLD_MAGENTA}└" + "─" * 58 + "┘" + f"{self.colors.ENDC}")
-            return "\n".join(output)
-        except:
+        addresses = self.resolve_addresses(domain)
+        if not any(addresses):
             return None
+        return self.format_ip_information(addresses)
     
     def show_summary_stats(self, whois_data):
         """Show colorful summary statistics"""
@@ -329,19 +1634,15 @@ class ColorfulWHOIS:
         stats.append(f"{self.colors.CYAN}▰" * 60 + f"{self.colors.ENDC}")
         
         # Calculate days until expiration
-        if hasattr(whois_data, 'expiration_date') and whois_data.expiration_date:
-            exp_date = whois_data.expiration_date
-            if isinstance(exp_date, list):
-                exp_date = exp_date[0]
-            if isinstance(exp_date, datetime):
-                days_left = (exp_date - datetime.now()).days
-                if days_left > 0:
-                    status = f"{self.colors.GREEN}✓ Active ({days_left} days left){self.colors.ENDC}"
-                elif days_left == 0:
-                    status = f"{self.colors.YELLOW}⚠ Expires today{self.colors.ENDC}"
-                else:
-                    status = f"{self.colors.RED}✗ Expired ({abs(days_left)} days ago){self.colors.ENDC}"
-                stats.append(f"{self.colors.BOLD_WHITE}Domain Status:{self.colors.ENDC} {status}")
+        days_left = days_until_expiry(whois_data)
+        if days_left is not None:
+            if days_left > 0:
+                status = f"{self.colors.GREEN}✓ Active ({days_left} days left){self.colors.ENDC}"
+            elif days_left == 0:
+                status = f"{self.colors.YELLOW}⚠ Expires today{self.colors.ENDC}"
+            else:
+                status = f"{self.colors.RED}✗ Expired ({abs(days_left)} days ago){self.colors.ENDC}"
+            stats.append(f"{self.colors.BOLD_WHITE}Domain Status:{self.colors.ENDC} {status}")
         
         # Count name servers
         if hasattr(whois_data, 'name_servers') and whois_data.name_servers:
@@ -355,38 +1656,903 @@ class ColorfulWHOIS:
         stats.append(f"{self.colors.CYAN}▰" * 60 + f"{self.colors.ENDC}")
         return "\n".join(stats)
     
+    def strip_ansi(self, data):
+        """Remove ANSI color codes from text"""
+        if self.quiet:
+            # Nothing to strip, quiet mode never adds colors
+            return data
+        return self.ANSI_ESCAPE.sub('', data)
+    
+    async def _batch_job(self, domain, show_ip):
+        """Run one batch lookup on the event loop"""
+        import asyncio
+        if not show_ip:
+            return await self.query_domain_async(domain), None
+        
+        # DNS and WHOIS run side by side; a DNS failure only leaves the addresses empty
+        whois_data, addresses = await asyncio.gather(self.query_domain_async(domain),
+                                                     self.client._timed('dns', self.resolver.resolve(domain)))
+        return whois_data, addresses
+    
+    def render_batch_result(self, domain, summary, result=None, error=None):
+        """Render one finished batch lookup as a text block"""
+        block = [self.build_domain_header(domain)]
+        if error is not None:
+            block.append(f"{self.colors.RED}{self.colors.BOLD}{self.colors.ERROR_ICON} Error: {str(error)}{self.colors.ENDC}")
+            return "\n".join(block)
+        
+        whois_data, addresses = result
+        if summary:
+            block.append(self.show_summary_stats(whois_data))
+        else:
+            block.append(self.format_whois_output(whois_data))
+        if addresses:
+            block.append("\n" + self.format_ip_information(addresses))
+        return "\n".join(block)
+    
+    def emit_batch_result(self, domain, summary, result, error, out_file=None, writer=None):
+        """Write one batch result as a record, or print it as a text block"""
+        if writer:
+            whois_data, addresses = result or (None, None)
+            writer.write(build_record(domain, whois_data, addresses, error))
+        else:
+            text = self.render_batch_result(domain, summary, result, error)
+            print(text, flush=True)
+            if out_file:
+                out_file.write(self.strip_ansi(text) + "\n")
+                out_file.flush()
+    
+    async def run_batch_async(self, domains, workers=10, summary=False, show_ip=False, out_file=None, writer=None,
+                              retries=0, checkpoint=None, held=None):
+        """Look up many domains with a bounded number of queries in flight
+        
+        With a RecordBatch as held, results are collected in it instead of written.
+        """
+        import asyncio
+        import heapq
+        domains = enumerate(domains)
+        if checkpoint:
+            # Positions finished in an earlier run are skipped without any query
+            domains = ((index, domain) for index, domain in domains if not checkpoint.is_done(index))
+        counts = {'succeeded': 0, 'failed': 0}
+        
+        # Failed lookups wait here as (due, index, domain, attempt) until their backoff expires
+        retry_queue = [(0, index, domain, attempts) for index, (domain, attempts)
+                       in (checkpoint.retries.items() if checkpoint else ())]
+        heapq.heapify(retry_queue)
+        
+        def next_job():
+            if retry_queue and retry_queue[0][0] <= time.monotonic():
+                return heapq.heappop(retry_queue)[1:]
+            job = next(domains, None)
+            return job and (*job, 0)
+        
+        async def worker():
+            # Workers pull from the shared iterator so input is streamed, not preloaded
+            while True:
+                job = next_job()
+                if job is None:
+                    if not retry_queue:
+                        return
+                    await asyncio.sleep(max(0, retry_queue[0][0] - time.monotonic()))
+                    continue
+                index, domain, attempt = job
+                
+                # Domains checked recently enough are skipped without any query
+                if self.monitor and not attempt and not self.monitor.is_due(domain):
+                    if checkpoint:
+                        checkpoint.mark_done(index)
+                    continue
+                
+                result = error = None
+                started = time.perf_counter()
+                try:
+                    result = await self._batch_job(domain, show_ip)
+                    counts['succeeded'] += 1
+                except Exception as e:
+                    if attempt < retries and isinstance(e, RETRIABLE_ERRORS):
+                        delay = min(self.RETRY_MAX_DELAY, self.RETRY_DELAY * 2 ** attempt)
+                        heapq.heappush(retry_queue, (time.monotonic() + delay, index, domain, attempt + 1))
+                        if checkpoint:
+                            checkpoint.defer(index, domain, attempt + 1)
+                        if self.metrics:
+                            self.metrics.lookups['retry'] += 1
+                        continue
+                    error = e
+                    counts['failed'] += 1
+                
+                metrics = self.metrics
+                if metrics:
+                    metrics.observe_phase('lookup', time.perf_counter() - started)
+                    metrics.lookups['error' if error else 'ok'] += 1
+                    started = time.perf_counter()
+                
+                # In monitor mode only changed domains are emitted
+                if not self.monitor or not result or self.monitor.update(domain, result[0]):
+                    if held is not None:
+                        whois_data, addresses = result or (None, None)
+                        held.append(whois_data, domain, addresses, error)
+                    else:
+                        # Write each result as soon as it finishes
+                        self.emit_batch_result(domain, summary, result, error, out_file, writer)
+                
+                # Only written results count as done, so a resumed run never loses one
+                if checkpoint:
+                    checkpoint.mark_done(index)
+                if metrics:
+                    metrics.observe_phase('render', time.perf_counter() - started)
+        
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        return counts['succeeded'], counts['failed']
+    
+    def run_batch(self, domains, workers=10, summary=False, show_ip=False, output=None, output_format='text',
+                  retries=0, checkpoint=None, sort_by=None):
+        """Look up many domains concurrently on a single event loop
+        
+        With sort_by, results are held in a RecordBatch and written in the
+        order of that field once every lookup has finished.
+        """
+        import asyncio
+        if checkpoint and checkpoint.resumed:
+            self.notify(f"{self.colors.BOLD_YELLOW}{self.colors.INFO_ICON} Resuming from {checkpoint.path}: "
+                        f"{checkpoint.low_watermark + len(checkpoint.done) - len(checkpoint.retries)} domains already done, "
+                        f"{len(checkpoint.retries)} waiting to retry{self.colors.ENDC}")
+        # A resumed run appends to the output of the interrupted one
+        out_file = None
+        if output and output != '-':
+            out_file = open(output, 'a' if checkpoint and checkpoint.resumed else 'w', newline='')
+        writer = None
+        if output_format != 'text':
+            writer = RecordWriter(out_file or sys.stdout, output_format, header=not (out_file and out_file.tell()))
+        held = RecordBatch() if sort_by else None
+        started = time.perf_counter()
+        try:
+            succeeded, failed = asyncio.run(
+                self.run_batch_async(domains, workers, summary, show_ip, out_file, writer, retries, checkpoint, held))
+            if held is not None:
+                for row in held.order_by(sort_by):
+                    domain, whois_data, addresses, error = held.result(row)
+                    self.emit_batch_result(domain, summary, None if error else (whois_data, addresses), error,
+                                           out_file, writer)
+        except KeyboardInterrupt:
+            if checkpoint:
+                checkpoint.save()
+                self.notify(f"\n{self.colors.BOLD_YELLOW}{self.colors.WARNING_ICON} Progress saved to {checkpoint.path}, "
+                            f"run the same command again to resume{self.colors.ENDC}")
+            raise
+        finally:
+            self.resolver.close()
+            if out_file:
+                out_file.close()
+        if checkpoint:
+            checkpoint.remove()
+        
+        elapsed = time.perf_counter() - started
+        self.notify(f"\n{self.colors.BOLD_BLUE}{self.colors.ROCKET_ICON} Batch completed: "
+                    f"{self.colors.GREEN}{succeeded} succeeded{self.colors.BOLD_BLUE}, "
+                    f"{self.colors.RED}{failed} failed{self.colors.BOLD_BLUE} in {elapsed:.1f}s{self.colors.ENDC}")
+        self.show_cache_stats()
+        self.show_metrics_summary()
+        if self.monitor:
+            self.notify(f"{self.colors.DIM}Monitor: {self.monitor.changed} changed, {self.monitor.unchanged} unchanged, "
+                        f"{self.monitor.not_due} not due{self.colors.ENDC}")
+        if self.snapshots:
+            self.notify(f"{self.colors.DIM}Snapshots: {self.snapshots.added} new, "
+                        f"{self.snapshots.unchanged} unchanged{self.colors.ENDC}")
+        return succeeded, failed
+    
+    def format_snapshot_diff(self, domain, changes):
+        """Format field-level changes between snapshots of a domain"""
+        output = [self.build_domain_header(domain)]
+        output.append(self.format_section_header("CHANGES", self.colors.CALENDAR_ICON))
+        for taken, field, before, after in changes:
+            when = datetime.fromtimestamp(taken).strftime('%Y-%m-%d %H:%M')
+            if isinstance(before, list) or isinstance(after, list):
+                added = [item for item in after or [] if item not in (before or [])]
+                removed = [item for item in before or [] if item not in (after or [])]
+                change = " ".join([f"{self.colors.GREEN}+{item}" for item in added] +
+                                  [f"{self.colors.RED}-{item}" for item in removed])
+            else:
+                change = f"{self.colors.RED}{before or '-'} {self.colors.WHITE}→ {self.colors.GREEN}{after or '-'}"
+            output.append(f"{self.colors.DIM}{when}{self.colors.ENDC}  {self.colors.BOLD_CYAN}{field}:{self.colors.ENDC} "
+                          f"{change}{self.colors.ENDC}")
+        if len(output) == 2:
+            output.append(f"{self.colors.DIM}No field changes recorded{self.colors.ENDC}")
+        output.append(f"{self.colors.BOLD_MAGENTA}└" + "─" * 58 + "┘" + f"{self.colors.ENDC}")
+        return "\n".join(output)
+    
+    def enable_metrics(self, metrics=None):
+        """Turn on timing instrumentation for this tool and its client"""
+        self.metrics = metrics or LookupMetrics()
+        self.client.metrics = self.metrics
+        return self.metrics
+    
+    def show_metrics_summary(self):
+        """Print the per-phase and per-server timing table"""
+        if self.metrics and self.show_timings:
+            self.notify("")
+            for line in self.metrics.summary_lines():
+                self.notify(f"{self.colors.DIM}{line}{self.colors.ENDC}")
+    
+    def show_cache_stats(self):
+        """Print cache hit and miss counts"""
+        if self.cache:
+            self.notify(f"{self.colors.DIM}Cache: {self.cache.hits} hits, {self.cache.misses} misses{self.colors.ENDC}")
+    
     def save_to_file(self, data, filename):
         """Save output to file with confirmation"""
         try:
             with open(filename, 'w') as f:
                 # Remove ANSI color codes for file save
-                import re
-                ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-                clean_data = ansi_escape.sub('', data)
-                f.write(clean_data)
+                f.write(self.strip_ansi(data))
             
-            print(f"\n{self.colors.GREEN}{self.colors.BOLD}{self.colors.SUCCESS_ICON} Results saved to: {self.colors.BOLD_WHITE}{filename}{self.colors.ENDC}")
+            self.notify(f"\n{self.colors.GREEN}{self.colors.BOLD}{self.colors.SUCCESS_ICON} Results saved to: {self.colors.BOLD_WHITE}{filename}{self.colors.ENDC}")
         except Exception as e:
-            print(f"\n{self.colors.RED}{self.colors.BOLD}{self.colors.ERROR_ICON} Error saving file: {str(e)}{self.colors.ENDC}")
+            self.notify(f"\n{self.colors.RED}{self.colors.BOLD}{self.colors.ERROR_ICON} Error saving file: {str(e)}{self.colors.ENDC}")
 
-def main():
-    tool = ColorfulWHOIS()
+# ========== STRUCTURED OUTPUT ==========
+RECORD_FIELDS = [
+    'domain', 'registrar', 'whois_server', 'creation_date', 'expiration_date', 'updated_date',
+    'name_servers', 'status', 'dnssec', 'ipv4', 'ipv6', 'error',
+]
+
+def _first(value):
+    """Return the first item of a python-whois list field"""
+    if isinstance(value, list):
+        return value[0] if value else None
+    return value
+
+def _iso(value):
+    """Convert a python-whois date field to an ISO 8601 string"""
+    value = _first(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value) if value else None
+
+def _as_list(value, lower=False):
+    """Convert a python-whois field to a list of unique strings"""
+    if not value:
+        return []
+    if not isinstance(value, list):
+        value = [value]
+    seen = []
+    for item in value:
+        item = str(item).strip()
+        if lower:
+            item = item.lower()
+        if item and item not in seen:
+            seen.append(item)
+    return seen
+
+def _error_message(error):
+    """Reduce an exception to a one line message"""
+    if error is None:
+        return None
+    # python-whois errors carry the whole raw response, keep only its first line
+    lines = str(error).strip().splitlines()
+    return lines[0] if lines else type(error).__name__
+
+def build_record(domain, whois_data=None, addresses=None, error=None):
+    """Build a normalized, serializable record for one lookup"""
+    whois_data = whois_data or {}
+    ipv4, ipv6 = addresses or ([], [])
+    return {
+        'domain': domain,
+        'registrar': _first(whois_data.get('registrar')),
+        'whois_server': _first(whois_data.get('whois_server')),
+        'creation_date': _iso(whois_data.get('creation_date')),
+        'expiration_date': _iso(whois_data.get('expiration_date')),
+        'updated_date': _iso(whois_data.get('updated_date')),
+        'name_servers': _as_list(whois_data.get('name_servers'), lower=True),
+        'status': _as_list(whois_data.get('status')),
+        'dnssec': _first(whois_data.get('dnssec')),
+        'ipv4': list(ipv4),
+        'ipv6': list(ipv6),
+        'error': _error_message(error),
+    }
+
+class RecordWriter:
+    """Stream records as JSON Lines, CSV or TSV, one flushed line per domain"""
+    FORMATS = ('jsonl', 'csv', 'tsv')
     
-    # Show animated banner
-    tool.animated_banner()
+    def __init__(self, stream, output_format, header=True):
+        import csv
+        self.stream = stream
+        self.output_format = output_format
+        self.csv_writer = None
+        if output_format in ('csv', 'tsv'):
+            self.csv_writer = csv.DictWriter(stream, RECORD_FIELDS, delimiter=',' if output_format == 'csv' else '\t')
+            if header:
+                self.csv_writer.writeheader()
+    
+    def write(self, record):
+        """Write one record and flush it straight away"""
+        import json
+        if self.csv_writer:
+            # List fields are joined so every record stays a single row
+            self.csv_writer.writerow({key: ';'.join(value) if isinstance(value, list) else value
+                                      for key, value in record.items()})
+        else:
+            self.stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.stream.flush()
+
+# ========== LOOKUP SERVICE ==========
+class WHOISService:
+    """Local HTTP/JSON API answering lookups from one warm tool instance"""
+    IDLE_TIMEOUT = 30
+    # Request bodies are read and ignored so the next request parses; larger ones close the connection
+    MAX_BODY = 65536
+    
+    REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 502: 'Bad Gateway'}
+    
+    def __init__(self, tool, host='127.0.0.1', port=8043):
+        self.tool = tool
+        self.host = host
+        self.port = port
+        # domain -> task of the upstream query every concurrent request waits on
+        self._inflight = {}
+        self.coalesced = 0
+    
+    async def query(self, domain):
+        """Query a domain, merging concurrent requests into one upstream query"""
+        import asyncio
+        if domain in self._inflight:
+            self.coalesced += 1
+        else:
+            self._inflight[domain] = asyncio.ensure_future(self.tool.query_domain_async(domain))
+            self._inflight[domain].add_done_callback(lambda _: self._inflight.pop(domain, None))
+        return await asyncio.shield(self._inflight[domain])
+    
+    async def lookup(self, domain, show_ip=False):
+        """Build the structured record for one domain and its HTTP status"""
+        import asyncio
+        whois_data = addresses = error = None
+        try:
+            if show_ip:
+                whois_data, addresses = await asyncio.gather(self.query(domain), self.tool.resolver.resolve(domain))
+            else:
+                whois_data = await self.query(domain)
+        except Exception as e:
+            error = e
+        # An unregistered domain is a valid answer, only failed upstream queries are a bad gateway
+        if error is None:
+            status = 200
+        elif isinstance(error, WHOISNotFoundError):
+            status = 404
+        else:
+            status = 502
+        return status, build_record(domain, whois_data, addresses, error)
+    
+    async def route(self, method, target):
+        """Dispatch one request and return (status, content type, body)"""
+        import urllib.parse
+        if method != 'GET':
+            return 405, 'application/json', {'error': 'only GET is supported'}
+        
+        url = urllib.parse.urlsplit(target)
+        params = urllib.parse.parse_qs(url.query)
+        if url.path == '/lookup':
+            domain = params.get('domain', [''])[0]
+            if not domain:
+                return 400, 'application/json', {'error': 'missing domain parameter'}
+            show_ip = params.get('ip', ['0'])[0].lower() in ('1', 'true', 'yes')
+            try:
+                domain = normalize_domain(domain)
+            except ValueError as e:
+                return 400, 'application/json', {'error': str(e)}
+            status, record = await self.lookup(domain, show_ip)
+            return status, 'application/json', record
+        if url.path == '/health':
+            return 200, 'application/json', {'status': 'ok', 'inflight': len(self._inflight), 'coalesced': self.coalesced}
+        if url.path == '/metrics' and self.tool.metrics:
+            return 200, 'text/plain; version=0.0.4', self.tool.metrics.to_prometheus()
+        return 404, 'application/json', {'error': f'unknown path {url.path}'}
+    
+    async def handle(self, reader, writer):
+        """Serve HTTP/1.1 requests on one keep-alive connection"""
+        import asyncio
+        import json
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), self.IDLE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line.strip():
+                    break
+                
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    status, content_type, body = 400, 'application/json', {'error': 'malformed request line'}
+                    version = 'HTTP/1.0'
+                else:
+                    status, content_type, body = await self.route(method, target)
+                
+                payload = body.encode() if isinstance(body, str) else json.dumps(body, ensure_ascii=False).encode()
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                # Chunked or oversized bodies are not read, so their connection cannot carry another request
+                length = headers.get('content-length', '0')
+                if 'transfer-encoding' in headers or not length.isdigit() or int(length) > self.MAX_BODY:
+                    keep_alive = False
+                elif int(length):
+                    await reader.readexactly(int(length))
+                writer.write(f"HTTP/1.1 {status} {self.REASONS[status]}\r\n"
+                             f"Content-Type: {content_type}\r\n"
+                             f"Content-Length: {len(payload)}\r\n"
+                             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+    
+    async def serve(self):
+        """Accept connections until cancelled"""
+        import asyncio
+        server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.tool.notify(f"{self.tool.colors.BOLD_GREEN}{self.tool.colors.ROCKET_ICON} Serving WHOIS lookups on "
+                         f"http://{self.host}:{self.port}/lookup?domain=example.com{self.tool.colors.ENDC}")
+        async with server:
+            await server.serve_forever()
+    
+    def run(self):
+        """Run the service on a new event loop"""
+        import asyncio
+        try:
+            asyncio.run(self.serve())
+        finally:
+            self.tool.resolver.close()
+            if self.tool.cache:
+                self.tool.cache.close()
+            if self.tool.snapshots:
+                self.tool.snapshots.close()
+
+def parse_listen_address(text):
+    """Parse a [HOST:]PORT listen address option"""
+    host, _, port = text.rpartition(':')
+    try:
+        port = int(port)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid listen address '{text}', expected [HOST:]PORT")
+    return host or '127.0.0.1', port
+
+# ========== DOMAIN NORMALIZATION ==========
+# The ICANN section of the Public Suffix List (https://publicsuffix.org) ships
+# next to this file. Private suffixes such as github.io are left out because
+# WHOIS only knows the registrable domain above the registry's own suffix.
+PUBLIC_SUFFIX_LIST = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'public_suffix_list.dat')
+
+class PublicSuffixList:
+    """Public Suffix List rules, including wildcard and exception rules"""
+    def __init__(self, path=PUBLIC_SUFFIX_LIST):
+        with open(path, encoding='utf-8') as f:
+            self.text = f.read()
+        self.rules = set()
+        # "*.ck" is kept as "ck", "!www.ck" as "www.ck"
+        self.wildcards = set()
+        self.exceptions = set()
+        # TLDs whose rules have been read from the text
+        self.tlds = set()
+    
+    def load(self, tld):
+        """Read the rules ending in one TLD, so a single lookup parses only a handful"""
+        self.tlds.add(tld)
+        text = self.text
+        rules = [tld] if f'\n{tld}\n' in text else []
+        # A literal search for ".tld" at line ends is much faster than matching whole lines
+        for match in re.finditer(rf'\.{re.escape(tld)}$', text, re.MULTILINE):
+            rules.append(text[text.rfind('\n', 0, match.start()) + 1:match.end()])
+        # IDN rules stay in Unicode, hosts are decoded to match them
+        for rule in rules:
+            if rule.startswith('//'):
+                continue
+            if rule.startswith('!'):
+                self.exceptions.add(rule[1:])
+            elif rule.startswith('*.'):
+                self.wildcards.add(rule[2:])
+            else:
+                self.rules.add(rule)
+    
+    def suffix_labels(self, labels):
+        """Count the trailing labels that form the public suffix of a host"""
+        if any(label.startswith('xn--') for label in labels):
+            labels = [self._decode(label) for label in labels]
+        if labels[-1] not in self.tlds:
+            self.load(labels[-1])
+        # The longest matching rule wins, and an exception beats the wildcard it is carved out of
+        for start in range(len(labels)):
+            name = '.'.join(labels[start:])
+            if name in self.exceptions:
+                return len(labels) - start - 1
+            if name in self.rules or '.'.join(labels[start + 1:]) in self.wildcards:
+                return len(labels) - start
+        # Unlisted TLDs are public suffixes themselves
+        return 1
+    
+    @staticmethod
+    def _decode(label):
+        """Turn a punycode label back into the Unicode form the list uses"""
+        if label.startswith('xn--'):
+            with contextlib.suppress(UnicodeError):
+                return label[4:].encode('ascii').decode('punycode')
+        return label
+
+_public_suffixes = None
+
+def public_suffixes():
+    """Load the Public Suffix List once, when the first domain is normalized"""
+    global _public_suffixes
+    if _public_suffixes is None:
+        _public_suffixes = PublicSuffixList()
+    return _public_suffixes
+
+DOMAIN_LABEL = re.compile(r'^(?!-)[a-z0-9-]{1,63}(?<!-)$')
+IPV4_ADDRESS = re.compile(r'^\d{1,3}(?:\.\d{1,3}){3}$')
+
+def registrable_domain(host):
+    """Reduce a host name to the domain registered below its public suffix"""
+    labels = host.split('.')
+    return '.'.join(labels[-public_suffixes().suffix_labels(labels) - 1:])
+
+def normalize_domain(text):
+    """Turn a URL, host name or IDN into the punycode registrable domain"""
+    text = text.strip()
+    if any(char in text for char in '/:@?#[\\'):
+        import urllib.parse
+        # Without a scheme urlsplit sees no host, so the input is parsed as a network location
+        try:
+            host = urllib.parse.urlsplit(text if '://' in text else f'//{text}').hostname
+        except ValueError:
+            host = None
+    else:
+        # Plain host names, the common case, skip URL parsing
+        host = text.lower()
+    if not host:
+        raise ValueError(f"invalid domain '{text}'")
+    if ':' in host:
+        # urlsplit only returns a colon in the host for bracketed IPv6 addresses
+        raise ValueError(f"'{text}' is an IP address, not a domain")
+    
+    host = host.rstrip('.')
+    if not host.isascii():
+        try:
+            host = host.encode('idna').decode('ascii')
+        except UnicodeError:
+            raise ValueError(f"invalid internationalized domain '{text}'")
+    
+    labels = host.split('.')
+    if len(labels) < 2 or len(host) > 253 or not all(DOMAIN_LABEL.match(label) for label in labels):
+        raise ValueError(f"invalid domain '{text}'")
+    if IPV4_ADDRESS.match(host):
+        raise ValueError(f"'{text}' is an IP address, not a domain")
+    if public_suffixes().suffix_labels(labels) >= len(labels):
+        raise ValueError(f"'{text}' is a public suffix, not a registrable domain")
+    return registrable_domain(host)
+
+class DomainNormalizer:
+    """Batch input stage yielding each registrable domain once"""
+    # Distinct domains remembered per generation; a repeat that comes after two
+    # full generations is looked up again, so memory stays bounded
+    DEDUP_WINDOW = 200000
+    
+    def __init__(self, on_invalid=None, shard=None, shard_by='tld'):
+        # Called with (text, error) for every entry that is not a domain
+        self.on_invalid = on_invalid
+        # (index, count) of the only shard to keep, None keeps everything
+        self.shard = shard
+        self.shard_by = shard_by
+        # Hashes of recently seen domains, the current generation and the one before it
+        self.seen = set()
+        self.previous = set()
+        self.duplicates = 0
+        self.invalid = 0
+    
+    def normalize(self, domains):
+        """Normalize a stream of raw entries, dropping invalid ones, other shards' domains and duplicates"""
+        for text in domains:
+            try:
+                domain = normalize_domain(text)
+            except ValueError as e:
+                # Entries that belong to no shard are reported by the first one only
+                if self.shard and self.shard[0] != 0:
+                    continue
+                self.invalid += 1
+                if self.on_invalid:
+                    self.on_invalid(text, e)
+                continue
+            if self.shard and shard_of(domain, self.shard[1], self.shard_by) != self.shard[0]:
+                continue
+            
+            key = hash(domain)
+            if key in self.seen or key in self.previous:
+                self.duplicates += 1
+                self.seen.add(key)
+                continue
+            if len(self.seen) >= self.DEDUP_WINDOW:
+                self.previous, self.seen = self.seen, set()
+            self.seen.add(key)
+            yield domain
+
+# ========== SHARDING ==========
+# Exit status of a batch in which every lookup failed, apart from 1 for a crash and 2 for usage errors
+EXIT_ALL_FAILED = 3
+
+def parse_shard(text):
+    """Parse an INDEX/COUNT shard option"""
+    try:
+        index, count = (int(part) for part in text.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid shard '{text}', expected INDEX/COUNT")
+    if not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"shard index must be between 0 and {count - 1}")
+    return index, count
+
+# TLDs whose registries answer on one shared WHOIS server are sharded as one key
+REGISTRY_GROUPS = {
+    'net': 'com',  # whois.verisign-grs.com
+    'ngo': 'org', 'ong': 'org',  # whois.publicinterestregistry.org
+    'dev': 'app', 'page': 'app',  # whois.nic.google
+}
+
+def shard_of(domain, count, by='tld'):
+    """Pick the shard for a domain by rendezvous hashing of its registry or full name"""
+    import hashlib
+    if by == 'tld':
+        tld = domain.rsplit('.', 1)[-1].lower()
+        key = REGISTRY_GROUPS.get(tld, tld).encode()
+    else:
+        key = domain.lower().encode()
+    # Highest random weight, so changing the shard count only moves keys from or to the changed shards
+    return max(range(count), key=lambda shard: hashlib.blake2b(key, digest_size=8, salt=str(shard).encode()).digest())
+
+def shard_path(work_dir, index, count, extension):
+    """Name one shard's file in a shared work directory"""
+    return os.path.join(work_dir, f"shard-{index}-of-{count}.{extension}")
+
+def shard_command(argv, index, count, checkpoint=None, metrics=None):
+    """Build the command line that runs one shard of a sharded batch"""
+    # Later options win in argparse, so the overrides are simply appended
+    command = [sys.executable, os.path.abspath(__file__), *argv,
+               '--shards', '1', '--shard', f'{index}/{count}', '--format', 'jsonl', '--output', '-']
+    # Every shard keeps its own state files
+    if checkpoint:
+        command += ['--checkpoint', f'{checkpoint}.{index}']
+    if metrics:
+        command += ['--metrics', f'{metrics}.{index}']
+    return command
+
+async def merge_shards(commands, writer, domains=None, shard_by='tld'):
+    """Run shard processes and stream their JSON Lines records into one writer
+    
+    With domains given, each one is piped to the stdin of the shard it belongs to.
+    """
+    import asyncio
+    import json
+    counts = Counter()
+    stdin = asyncio.subprocess.PIPE if domains is not None else None
+    processes = [await asyncio.create_subprocess_exec(*command, stdin=stdin, stdout=asyncio.subprocess.PIPE,
+                                                      limit=2 ** 20)
+                 for command in commands]
+    
+    async def pump(process):
+        async for line in process.stdout:
+            record = json.loads(line)
+            counts['failed' if record['error'] else 'succeeded'] += 1
+            writer.write(record)
+        return await process.wait()
+    
+    async def feed():
+        loop = asyncio.get_running_loop()
+        domains_iter = iter(domains)
+        # A shard that died stops the feed; its exit code fails the run
+        with contextlib.suppress(ConnectionError):
+            while True:
+                # Reading the input blocks, so batches are read in a thread while records keep streaming
+                batch = await loop.run_in_executor(None, lambda: list(itertools.islice(domains_iter, 1000)))
+                if not batch:
+                    break
+                for domain in batch:
+                    processes[shard_of(domain, len(processes), shard_by)].stdin.write(f"{domain}\n".encode())
+                await asyncio.gather(*(process.stdin.drain() for process in processes))
+        for process in processes:
+            process.stdin.close()
+    
+    if domains is not None:
+        feeder = asyncio.ensure_future(feed())
+    returncodes = await asyncio.gather(*(pump(process) for process in processes))
+    if domains is not None:
+        await feeder
+    return counts['succeeded'], counts['failed'], returncodes
+
+def merge_prometheus(paths, path):
+    """Sum the samples of several Prometheus text files into one file"""
+    # Metric family -> its TYPE line and samples, in first-seen order
+    families = {}
+    for shard_file in paths:
+        if not os.path.exists(shard_file):
+            continue
+        with open(shard_file) as f:
+            for line in f:
+                line = line.rstrip('\n')
+                if line.startswith('# TYPE '):
+                    family = families.setdefault(line.split()[2], (line, {}))
+                elif line:
+                    sample, value = line.rsplit(' ', 1)
+                    samples = family[1]
+                    samples[sample] = samples.get(sample, 0) + (float(value) if '.' in value else int(value))
+    
+    lines = []
+    for type_line, samples in families.values():
+        lines.append(type_line)
+        lines.extend(f"{sample} {value:.6f}" if isinstance(value, float) else f"{sample} {value}"
+                     for sample, value in samples.items())
+    temporary = f"{path}.tmp"
+    with open(temporary, 'w') as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(temporary, path)
+
+def read_domains(source):
+    """Yield domains from a file path or stdin ('-'), one per line"""
+    handle = sys.stdin if source == '-' else open(source)
+    try:
+        for line in handle:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield line
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+
+class HelpFormatter(argparse.RawDescriptionHelpFormatter):
+    """Help formatter that sizes itself without importing shutil"""
+    # argparse builds a formatter for every option, so the terminal is measured once
+    columns = None
+    
+    def __init__(self, prog):
+        if HelpFormatter.columns is None:
+            try:
+                HelpFormatter.columns = int(os.environ['COLUMNS'])
+            except (KeyError, ValueError):
+                try:
+                    HelpFormatter.columns = os.get_terminal_size(sys.__stdout__.fileno()).columns
+                except (AttributeError, ValueError, OSError):
+                    HelpFormatter.columns = 80
+        # The same two column margin argparse keeps when it measures the terminal itself
+        super().__init__(prog, width=HelpFormatter.columns - 2)
+
+def main():
+    # Non-interactive runs (pipes, cron, redirects) skip colors and animations
+    tool = ColorfulWHOIS(quiet=not sys.stdout.isatty())
     
     # Setup argument parser
     parser = argparse.ArgumentParser(
         description=f'{tool.colors.BOLD_CYAN}Colorful WHOIS Lookup Tool{tool.colors.ENDC}',
         epilog=f'{tool.colors.BOLD_GREEN}Example: {tool.colors.BOLD_YELLOW}python whois_colorful.py example.com -o report.txt{tool.colors.ENDC}',
-        formatter_class=argparse.RawDescriptionHelpFormatter
+        formatter_class=HelpFormatter
     )
     
     parser.add_argument(
         'domain',
+        nargs='?',
         help=f'{tool.colors.CYAN}Domain name to lookup (e.g., example.com){tool.colors.ENDC}'
     )
     
+    parser.add_argument(
+        '-q', '--quiet',
+        action='store_true',
+        help=f'{tool.colors.MAGENTA}Plain output without colors or animations (default when not a terminal){tool.colors.ENDC}'
+    )
+    
+    parser.add_argument(
+        '--format',
+        choices=['text'] + list(RecordWriter.FORMATS),
+        default='text',
+        help=f'{tool.colors.MAGENTA}Output format; jsonl, csv and tsv stream one record per domain (default: text){tool.colors.ENDC}'
+    )
+    
+    parser.add_argument(
+        '-f', '--file',
+        help=f'{tool.colors.CYAN}Read domains to lookup from file, one per line (use - for stdin){tool.colors.ENDC}'
+    )
+    
+    parser.add_argument(
+        '--monitor',
+        metavar='STATE_FILE',
+        help=f'{tool.colors.CYAN}Expiry monitoring with --file: only query due domains and only show changed ones{tool.colors.ENDC}'
+    )
+    
+    parser.add_argument(
+        '--shards',
+        type=int,
+        default=1,
+        metavar='N',
+        help=f'{tool.colors.CYAN}Split --file across N worker processes and merge their output{tool.colors.ENDC}'
+    )
+    
+    parser.add_argument(
+        '--shard',
+        type=parse_shard,
+        metavar='INDEX/COUNT',
+        help=f'{tool.colors.CYAN}Only look up this shard of --file, e.g. 0/4 on the first of four hosts{tool.colors.ENDC}'
+    )
+    
+    parser.add_argument(
+        '--shard-by',
+        choices=['tld', 'domain'],
+        default='tld',
+        help=f'{tool.colors.CYAN}Shard by TLD so each registry server is queried from one shard, or by domain (default: tld){tool.colors.ENDC}'
+    )
+    
+    parser.add_argument(
+        '--work-dir',
+        metavar='DIR',
+        help=f'{tool.colors.CYAN}Shared directory for per-shard output and checkpoint files{tool.colors.ENDC}'
+    )
+    
+    parser.add_argument(
+        '--checkpoint',
+        metavar='FILE',
+        help=f'{tool.colors.CYAN}Save batch progress to FILE and resume from it if it exists{tool.colors.ENDC}'
+    )
+    
+    parser.add_argument(
+        '--sort-by',
+        metavar='FIELD',
+        choices=['domain', 'registrar', 'whois_server', 'creation_date', 'expiration_date', 'updated_date'],
+        help=f'{tool.colors.CYAN}Hold the results of --file and write them ordered by domain, registrar, whois_server or a date field once all lookups finished{tool.colors.ENDC}'
+    )
+    
+    parser.add_argument(
+        '--retries',
+        type=int,
+        default=2,
+        help=f'{tool.colors.CYAN}Retries for domains that failed with a timeout or rate limit (default: 2){tool.colors.ENDC}'
+    )
+    
+    parser.add_argument(
+        '--snapshots',
+        metavar='DIR',
+        help=f'{tool.colors.CYAN}Keep a compressed history of every lookup in DIR{tool.colors.ENDC}'
+    )
+    
+    parser.add_argument(
+        '--diff',
+        metavar='DOMAIN',
+        help=f'{tool.colors.CYAN}Show field changes between the snapshots of DOMAIN in --snapshots{tool.colors.ENDC}'
+    )
+    
+    parser.add_argument(
+        '--serve',
+        type=parse_listen_address,
+        metavar='[HOST:]PORT',
+        help=f'{tool.colors.CYAN}Run as a long-lived HTTP/JSON lookup service (GET /lookup?domain=...){tool.colors.ENDC}'
+    )
+    
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=10,
+        help=f'{tool.colors.BLUE}Number of concurrent lookups in batch mode (default: 10){tool.colors.ENDC}'
+    )
+    
+    parser.add_argument(
+        '-t', '--timeout',
+        type=float,
+        default=10,
+        help=f'{tool.colors.BLUE}Timeout in seconds for each WHOIS query (default: 10){tool.colors.ENDC}'
+    )
+    
     parser.add_argument(
         '-o', '--output',
         help=f'{tool.colors.GREEN}Save output to file{tool.colors.ENDC}'
@@ -404,10 +2570,265 @@ def main():
         help=f'{tool.colors.MAGENTA}Show summary statistics only{tool.colors.ENDC}'
     )
     
+    parser.add_argument(
+        '--dns-timeout',
+        type=float,
+        default=5,
+        help=f'{tool.colors.BLUE}Timeout in seconds for resolving IP addresses (default: 5){tool.colors.ENDC}'
+    )
+    
+    parser.add_argument(
+        '--rate',
+        type=float,
+        default=ServerScheduler.DEFAULT_RATE,
+        help=f'{tool.colors.BLUE}Default queries per second for each WHOIS server (default: {ServerScheduler.DEFAULT_RATE:g}){tool.colors.ENDC}'
+    )
+    
+    parser.add_argument(
+        '--server-concurrency',
+        type=int,
+        default=ServerScheduler.DEFAULT_CONCURRENCY,
+        help=f'{tool.colors.BLUE}Default open connections for each WHOIS server (default: {ServerScheduler.DEFAULT_CONCURRENCY}){tool.colors.ENDC}'
+    )
+    
+    parser.add_argument(
+        '--server-limit',
+        type=parse_server_limit,
+        action='append',
+        default=[],
+        metavar='HOST=RATE[/CONCURRENCY]',
+        help=f'{tool.colors.BLUE}Limit for one WHOIS server, may be repeated (e.g., whois.verisign-grs.com=20/20){tool.colors.ENDC}'
+    )
+    
+    parser.add_argument(
+        '--parser',
+        choices=['builtin', 'python-whois'],
+        default='builtin',
+        help=f'{tool.colors.BLUE}WHOIS response parser (default: builtin){tool.colors.ENDC}'
+    )
+    
+    parser.add_argument(
+        '--metrics',
+        metavar='FILE',
+        help=f'{tool.colors.BLUE}Write per-phase and per-server metrics in Prometheus text format{tool.colors.ENDC}'
+    )
+    
+    parser.add_argument(
+        '--timings',
+        action='store_true',
+        help=f'{tool.colors.BLUE}Show a per-phase and per-server timing table at the end{tool.colors.ENDC}'
+    )
+    
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help=f'{tool.colors.BLUE}Do not read or write the response cache{tool.colors.ENDC}'
+    )
+    
+    parser.add_argument(
+        '--refresh',
+        action='store_true',
+        help=f'{tool.colors.BLUE}Ignore cached responses but store fresh ones{tool.colors.ENDC}'
+    )
+    
+    parser.add_argument(
+        '--cache-path',
+        default=WHOISCache.DEFAULT_PATH,
+        help=f'{tool.colors.BLUE}Response cache database (default: {WHOISCache.DEFAULT_PATH}){tool.colors.ENDC}'
+    )
+    
+    parser.add_argument(
+        '--cache-ttl',
+        type=float,
+        default=24,
+        help=f'{tool.colors.BLUE}Hours to keep responses for registered domains (default: 24){tool.colors.ENDC}'
+    )
+    
+    parser.add_argument(
+        '--cache-negative-ttl',
+        type=float,
+        default=1,
+        help=f'{tool.colors.BLUE}Hours to keep "no match" responses (default: 1){tool.colors.ENDC}'
+    )
+    
+    parser.add_argument(
+        '--cache-size',
+        type=int,
+        default=100000,
+        help=f'{tool.colors.BLUE}Maximum number of cached responses (default: 100000){tool.colors.ENDC}'
+    )
+    
     args = parser.parse_args()
+    # Structured formats are meant for machines, never decorate them
+    if (args.quiet or args.format != 'text') and not tool.quiet:
+        tool = ColorfulWHOIS(quiet=True)
+    
+    # Show animated banner
+    tool.animated_banner()
+    
+    limits = dict(args.server_limit)
+    shards = 1
+    if args.shard and args.shard_by == 'domain':
+        # Every shard queries every server, so each gets an equal share of the limits
+        share = args.shard[1]
+        limits = {host: (rate / share, max(1, concurrency // share)) for host, (rate, concurrency) in limits.items()}
+        args.rate /= share
+        args.server_concurrency = max(1, args.server_concurrency // share)
+    elif args.shard:
+        # Only the registry servers of this shard's TLDs keep their full limits
+        shards = args.shard[1]
+    scheduler = ServerScheduler(limits, default_rate=args.rate, default_concurrency=args.server_concurrency,
+                                shards=shards)
+    tool.client = AsyncWHOISClient(connect_timeout=args.timeout, read_timeout=args.timeout, scheduler=scheduler)
+    tool.refresh = args.refresh
+    tool.resolver.timeout = args.dns_timeout
+    if args.metrics or args.timings:
+        tool.enable_metrics()
+        tool.show_timings = args.timings
+    tool.use_python_whois = args.parser == 'python-whois'
+    if not args.no_cache:
+        tool.cache = WHOISCache(args.cache_path, ttl=args.cache_ttl * 3600,
+                                negative_ttl=args.cache_negative_ttl * 3600, max_entries=args.cache_size)
+    
+    if not args.domain and not args.file and not args.serve and not args.diff:
+        parser.error('a domain, --file, --serve or --diff is required')
+    if args.diff and not args.snapshots:
+        parser.error('--diff requires --snapshots')
+    if args.snapshots:
+        tool.snapshots = SnapshotStore(args.snapshots)
+    if args.monitor and not args.file:
+        parser.error('--monitor requires --file')
+    if args.workers < 1:
+        parser.error('--workers must be at least 1')
+    if args.rate <= 0 or args.server_concurrency < 1:
+        parser.error('--rate and --server-concurrency must be positive')
+    if (args.shards > 1 or args.shard) and not args.file:
+        parser.error('--shards and --shard require --file')
+    if args.shards > 1 and args.format == 'text':
+        parser.error('--shards requires --format jsonl, csv or tsv')
+    if args.sort_by and (args.shards > 1 or args.checkpoint):
+        # Held results are only written at the end, so there is nothing to merge or resume before then
+        parser.error('--sort-by cannot be combined with --shards or --checkpoint')
+    if args.shard and args.work_dir:
+        # Each shard of a multi-host run keeps its files in the shared directory
+        os.makedirs(args.work_dir, exist_ok=True)
+        args.output = args.output or shard_path(args.work_dir, *args.shard, 'txt' if args.format == 'text' else args.format)
+        if not args.sort_by:
+            args.checkpoint = args.checkpoint or shard_path(args.work_dir, *args.shard, 'ckpt')
+    
+    # Snapshot diff mode, answered from the local history only
+    if args.diff:
+        try:
+            domain = normalize_domain(args.diff)
+        except ValueError as e:
+            parser.error(str(e))
+        changes = list(tool.snapshots.changes(domain))
+        if not tool.snapshots.history(domain):
+            tool.notify(f"{tool.colors.YELLOW}{tool.colors.WARNING_ICON} No snapshots of {domain} in {args.snapshots}{tool.colors.ENDC}")
+        elif args.format == 'text':
+            print(tool.format_snapshot_diff(domain, changes))
+        else:
+            import json
+            for taken, field, before, after in changes:
+                print(json.dumps({'domain': domain, 'time': datetime.fromtimestamp(taken).isoformat(timespec='seconds'),
+                                  'field': field, 'old': before, 'new': after}, ensure_ascii=False))
+        tool.snapshots.close()
+        return
+    
+    # Lookup service mode
+    if args.serve:
+        if not tool.metrics:
+            tool.enable_metrics()
+        WHOISService(tool, *args.serve).run()
+        return
+    
+    # Sharded batch mode, one child process per shard
+    if args.shards > 1:
+        commands = [shard_command(sys.argv[1:], index, args.shards, args.checkpoint, args.metrics)
+                    for index in range(args.shards)]
+        # Shards resuming from their checkpoints append to the merged output
+        checkpoints = [f"{args.checkpoint}.{index}" if args.checkpoint else
+                       args.work_dir and shard_path(args.work_dir, index, args.shards, 'ckpt')
+                       for index in range(args.shards)]
+        resumed = any(path and os.path.exists(path) for path in checkpoints)
+        domains = None
+        if args.file == '-':
+            # The shards cannot share stdin, so the driver reads it and routes each domain
+            def routed(texts):
+                for text in texts:
+                    try:
+                        yield normalize_domain(text)
+                    except ValueError as e:
+                        tool.notify(f"{tool.colors.YELLOW}{tool.colors.WARNING_ICON} Skipping: {e}{tool.colors.ENDC}")
+            domains = routed(read_domains('-'))
+        import asyncio
+        started = time.perf_counter()
+        with (open(args.output, 'a' if resumed else 'w', newline='') if args.output
+              else contextlib.nullcontext(sys.stdout)) as out_file:
+            writer = RecordWriter(out_file, args.format, header=not (args.output and out_file.tell()))
+            succeeded, failed, returncodes = asyncio.run(merge_shards(commands, writer, domains, args.shard_by))
+        if args.metrics:
+            merge_prometheus([f"{args.metrics}.{index}" for index in range(args.shards)], args.metrics)
+        tool.notify(f"\n{tool.colors.BOLD_BLUE}{tool.colors.ROCKET_ICON} Sharded batch completed: "
+                    f"{tool.colors.GREEN}{succeeded} succeeded{tool.colors.BOLD_BLUE}, "
+                    f"{tool.colors.RED}{failed} failed{tool.colors.BOLD_BLUE} across {args.shards} shards "
+                    f"in {time.perf_counter() - started:.1f}s{tool.colors.ENDC}")
+        if tool.cache:
+            tool.cache.close()
+        # A shard whose lookups all failed is fine while others succeeded, any other exit means it broke
+        if any(code not in (0, EXIT_ALL_FAILED) for code in returncodes):
+            sys.exit(1)
+        if failed and not succeeded:
+            sys.exit(EXIT_ALL_FAILED)
+        return
+    
+    # Batch mode, also used for structured output of a single domain
+    if args.file or args.format != 'text':
+        if args.monitor:
+            tool.monitor = ExpiryMonitor(args.monitor)
+        normalizer = DomainNormalizer(lambda text, error: tool.notify(
+            f"{tool.colors.YELLOW}{tool.colors.WARNING_ICON} Skipping: {error}{tool.colors.ENDC}"),
+            shard=args.shard, shard_by=args.shard_by)
+        if args.file:
+            domains = interleave_by_tld(normalizer.normalize(read_domains(args.file)))
+        else:
+            try:
+                domains = [normalize_domain(args.domain)]
+            except ValueError as e:
+                parser.error(str(e))
+        checkpoint = None
+        if args.checkpoint:
+            try:
+                checkpoint = BatchCheckpoint(args.checkpoint, source=args.file or args.domain)
+            except ValueError as e:
+                parser.error(str(e))
+        succeeded, failed = tool.run_batch(domains, workers=args.workers, summary=args.summary,
+                                           show_ip=args.ip, output=args.output, output_format=args.format,
+                                           retries=args.retries, checkpoint=checkpoint,
+                                           sort_by={'domain': 'domain_name'}.get(args.sort_by, args.sort_by))
+        if normalizer.duplicates or normalizer.invalid:
+            tool.notify(f"{tool.colors.DIM}Input: {normalizer.duplicates} duplicates and "
+                        f"{normalizer.invalid} invalid entries skipped{tool.colors.ENDC}")
+        if tool.cache:
+            tool.cache.close()
+        if tool.monitor:
+            tool.monitor.close()
+        if tool.snapshots:
+            tool.snapshots.close()
+        if args.metrics:
+            tool.metrics.write_prometheus(args.metrics)
+        if failed and not succeeded:
+            sys.exit(EXIT_ALL_FAILED)
+        return
     
     # Perform WHOIS lookup
     whois_data = tool.lookup_domain(args.domain)
+    if tool.cache:
+        tool.cache.close()
+    if tool.snapshots:
+        tool.snapshots.close()
+    if args.metrics:
+        tool.metrics.write_prometheus(args.metrics)
     
     if whois_data:
         output_data = []
@@ -426,29 +2847,33 @@ def main():
         # Show IP information if requested
         if args.ip:
             ip_info = tool.get_ip_information(args.domain)
+            tool.resolver.close()
             if ip_info:
                 output_data.append("\n" + ip_info)
                 print("\n" + ip_info)
             else:
-                print(f"\n{tool.colors.YELLOW}{tool.colors.WARNING_ICON} Could not resolve IP address{tool.colors.ENDC}")
+                tool.notify(f"\n{tool.colors.YELLOW}{tool.colors.WARNING_ICON} Could not resolve IP address{tool.colors.ENDC}")
         
         # Save to file if specified
         if args.output:
             tool.save_to_file("\n".join(output_data), args.output)
         
         # Show footer
-        print(f"\n{tool.colors.BOLD_BLUE}{tool.colors.ROCKET_ICON} WHOIS lookup completed {tool.colors.ROCKET_ICON}{tool.colors.ENDC}")
+        tool.notify(f"\n{tool.colors.BOLD_BLUE}{tool.colors.ROCKET_ICON} WHOIS lookup completed {tool.colors.ROCKET_ICON}{tool.colors.ENDC}")
+        tool.show_cache_stats()
+        tool.show_metrics_summary()
         
     else:
-        print(f"\n{tool.colors.RED}{tool.colors.BOLD}{tool.colors.ERROR_ICON} WHOIS lookup failed for {args.domain}{tool.colors.ENDC}")
+        tool.notify(f"\n{tool.colors.RED}{tool.colors.BOLD}{tool.colors.ERROR_ICON} WHOIS lookup failed for {args.domain}{tool.colors.ENDC}")
         sys.exit(1)
 
 if __name__ == "__main__":
+    colors = Colors() if sys.stdout.isatty() else PlainColors()
     try:
         main()
     except KeyboardInterrupt:
-        print(f"\n\n{tool.colors.YELLOW}{tool.colors.BOLD}{tool.colors.WARNING_ICON} Operation cancelled by user{tool.colors.ENDC}")
+        print(f"\n\n{colors.YELLOW}{colors.BOLD}{colors.WARNING_ICON} Operation cancelled by user{colors.ENDC}", file=sys.stderr)
         sys.exit(0)
     except Exception as e:
-        print(f"\n{tool.colors.RED}{tool.colors.BOLD}{tool.colors.ERROR_ICON} Unexpected error: {str(e)}{tool.colors.ENDC}")
+        print(f"\n{colors.RED}{colors.BOLD}{colors.ERROR_ICON} Unexpected error: {str(e)}{colors.ENDC}", file=sys.stderr)
         sys.exit(1)
@@ -0,0 +1,168 @@
+"""Batch checkpoint and resume tests with stubbed lookups"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import main
+
+
+class ListWriter:
+    """Record writer keeping records in memory"""
+    def __init__(self):
+        self.records = []
+
+    def write(self, record):
+        self.records.append(record)
+
+
+class StubTool(main.ColorfulWHOIS):
+    """Tool answering from memory; domains in `failing` time out until they are removed"""
+    RETRY_DELAY = 0.01
+
+    def __init__(self, failing=()):
+        super().__init__(quiet=True)
+        self.failing = set(failing)
+        self.queries = []
+
+    async def query_domain_async(self, domain):
+        self.queries.append(domain)
+        await asyncio.sleep(0.001)
+        if domain in self.failing:
+            raise main.WHOISTimeoutError(f"Reading from whois.example timed out for {domain}")
+        return {'registrar': 'Example Registrar, Inc.'}
+
+
+class CheckpointTest(unittest.TestCase):
+    """The low watermark plus the out-of-order done set record finished positions"""
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'batch.checkpoint')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_low_watermark_and_done_set(self):
+        checkpoint = main.BatchCheckpoint(self.path, 'domains.txt')
+        for index in (0, 2, 3, 5):
+            checkpoint.mark_done(index)
+        self.assertEqual(checkpoint.low_watermark, 1)
+        self.assertEqual(checkpoint.done, {2, 3, 5})
+        self.assertEqual([index for index in range(7) if checkpoint.is_done(index)], [0, 2, 3, 5])
+
+        # Filling the gap folds the finished run above it into the watermark
+        checkpoint.mark_done(1)
+        self.assertEqual(checkpoint.low_watermark, 4)
+        self.assertEqual(checkpoint.done, {5})
+
+    def test_save_and_reload(self):
+        checkpoint = main.BatchCheckpoint(self.path, 'domains.txt')
+        for index in (0, 1, 4):
+            checkpoint.mark_done(index)
+        checkpoint.defer(2, 'retry.com', 1)
+        checkpoint.save()
+
+        resumed = main.BatchCheckpoint(self.path, 'domains.txt')
+        self.assertTrue(resumed.resumed)
+        self.assertEqual(resumed.low_watermark, 3)
+        self.assertEqual(resumed.done, {4})
+        self.assertEqual(resumed.retries, {2: ['retry.com', 1]})
+        self.assertFalse(resumed.is_done(3))
+
+        # A retried position that succeeds leaves the retry table
+        resumed.mark_done(2)
+        self.assertEqual(resumed.retries, {})
+
+    def test_other_source_is_refused(self):
+        main.BatchCheckpoint(self.path, 'domains.txt').save()
+        with self.assertRaises(ValueError):
+            main.BatchCheckpoint(self.path, 'other.txt')
+
+    def test_remove(self):
+        checkpoint = main.BatchCheckpoint(self.path)
+        checkpoint.save()
+        checkpoint.remove()
+        self.assertFalse(os.path.exists(self.path))
+        checkpoint.remove()
+
+
+class ResumeTest(unittest.TestCase):
+    """An interrupted batch resumes where it stopped without losing or repeating records"""
+    DOMAINS = [f"domain{index}.com" for index in range(400)]
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'batch.checkpoint')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def run_until(self, tool, checkpoint, writer, stop_after=None, retries=0):
+        """Run a batch, cancelling it like Ctrl-C once `stop_after` records were written"""
+        async def batch():
+            task = asyncio.ensure_future(tool.run_batch_async(iter(self.DOMAINS), workers=8, writer=writer,
+                                                              retries=retries, checkpoint=checkpoint))
+            if stop_after is None:
+                return await task
+            while len(writer.records) < stop_after:
+                self.assertFalse(task.done(), "batch finished before the interrupt")
+                await asyncio.sleep(0.001)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+        asyncio.run(batch())
+        checkpoint.save()
+
+    def test_interrupt_then_resume(self):
+        first = ListWriter()
+        self.run_until(StubTool(), main.BatchCheckpoint(self.path, 'domains.txt'), first, stop_after=150)
+        self.assertGreaterEqual(len(first.records), 150)
+        self.assertLess(len(first.records), 400)
+
+        checkpoint = main.BatchCheckpoint(self.path, 'domains.txt')
+        self.assertTrue(checkpoint.resumed)
+        second = ListWriter()
+        tool = StubTool()
+        self.run_until(tool, checkpoint, second)
+
+        written = [record['domain'] for record in first.records + second.records]
+        self.assertEqual(len(written), 400)
+        self.assertEqual(set(written), set(self.DOMAINS))
+        # The resumed run only queried what the first one had not written
+        self.assertEqual(len(tool.queries), len(second.records))
+        self.assertEqual(checkpoint.low_watermark, 400)
+        self.assertEqual(checkpoint.done, set())
+
+    def test_retry_queue_survives_interrupt(self):
+        failing = {'domain7.com', 'domain123.com', 'domain350.com'}
+        tool = StubTool(failing)
+        # A long backoff keeps the failures queued until the batch is interrupted
+        tool.RETRY_DELAY = 60
+        first = ListWriter()
+        self.run_until(tool, main.BatchCheckpoint(self.path, 'domains.txt'), first, stop_after=397, retries=3)
+        self.assertNotIn('domain7.com', {record['domain'] for record in first.records})
+
+        with open(self.path) as f:
+            state = json.load(f)
+        self.assertEqual({domain for domain, _ in state['retries'].values()}, failing)
+        self.assertEqual({attempts for _, attempts in state['retries'].values()}, {1})
+
+        # The resumed run retries the queued domains straight away, without reading the input again
+        checkpoint = main.BatchCheckpoint(self.path, 'domains.txt')
+        second = ListWriter()
+        tool = StubTool()
+        self.run_until(tool, checkpoint, second, retries=3)
+        self.assertEqual(sorted(tool.queries), sorted(failing))
+        self.assertEqual({record['domain'] for record in second.records}, failing)
+        self.assertTrue(all(record['error'] is None for record in second.records))
+        self.assertEqual(checkpoint.retries, {})
+        self.assertEqual(checkpoint.low_watermark, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
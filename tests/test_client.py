@@ -0,0 +1,118 @@
+"""Asyncio WHOIS client tests against a local fake port 43 server"""
+import asyncio
+import os
+import sys
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import main
+
+
+class FakePort43:
+    """Local WHOIS server answering queries from a dict, or never when stalled"""
+    def __init__(self, answers, stall=False):
+        self.answers = answers
+        self.stall = stall
+        self.queries = []
+        self.server = None
+        self.port = None
+
+    async def handle(self, reader, writer):
+        query = (await reader.readline()).decode().strip()
+        self.queries.append(query)
+        if self.stall:
+            await asyncio.sleep(3600)
+        writer.write(self.answers.get(query, 'No match for "%s".\n' % query).encode())
+        await writer.drain()
+        writer.close()
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self.handle, '127.0.0.1', 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.server.close()
+        await self.server.wait_closed()
+
+
+def make_client(port, **kwargs):
+    """Client whose IANA, registry and registrar hops all reach the fake server
+
+    The hops share one address, so the registry ("localhost") gets its own
+    query syntax to tell its queries apart from the IANA and registrar ones.
+    """
+    client = main.AsyncWHOISClient(port=port, iana_server='127.0.0.1', max_retries=0, **kwargs)
+    client.QUERY_FORMATS = {'localhost': 'registry {}'}
+    return client
+
+
+class ReferralTest(unittest.IsolatedAsyncioTestCase):
+    async def test_follows_iana_registry_and_registrar(self):
+        answers = {
+            'com': 'domain:       COM\nrefer:        localhost\n',
+            'registry example.com': 'Domain Name: EXAMPLE.COM\nRegistrar WHOIS Server: 127.0.0.1\n',
+            'example.com': 'Domain Name: example.com\nRegistrar: Example Registrar, Inc.\n',
+        }
+        async with FakePort43(answers) as server:
+            client = make_client(server.port)
+            response = await client.query('example.com')
+        self.assertEqual(server.queries, ['com', 'registry example.com', 'example.com'])
+        self.assertEqual(response.servers, ['localhost', '127.0.0.1'])
+        self.assertIn('Example Registrar, Inc.', response.text)
+        self.assertEqual(client.tld_servers, {'com': 'localhost'})
+
+    async def test_iana_answer_is_reused_per_tld(self):
+        answers = {
+            'com': 'refer: localhost\n',
+            'registry a.com': 'Domain Name: A.COM\n',
+            'registry b.com': 'Domain Name: B.COM\n',
+        }
+        async with FakePort43(answers) as server:
+            client = make_client(server.port)
+            await asyncio.gather(client.query('a.com'), client.query('b.com'))
+        self.assertEqual(server.queries.count('com'), 1)
+
+    async def test_empty_registrar_server_is_not_a_referral(self):
+        # The value must not be taken from the next line ("Registrar URL: ...")
+        answers = {
+            'com': 'refer: localhost\n',
+            'registry example.com': 'Domain Name: EXAMPLE.COM\nRegistrar WHOIS Server: \n'
+                                    'Registrar URL: http://www.example.com\n',
+        }
+        async with FakePort43(answers) as server:
+            client = make_client(server.port)
+            response = await client.query('example.com')
+        self.assertEqual(response.servers, ['localhost'])
+        self.assertEqual(server.queries, ['com', 'registry example.com'])
+        self.assertNotIn('registrar', client.scheduler.servers)
+
+    async def test_empty_iana_whois_line_is_not_a_server(self):
+        async with FakePort43({'zz': 'whois:\nstatus: ACTIVE\n'}) as server:
+            client = make_client(server.port)
+            with self.assertRaises(main.WHOISLookupError):
+                await client.query('example.zz')
+
+
+class TimeoutTest(unittest.IsolatedAsyncioTestCase):
+    async def test_read_timeout(self):
+        async with FakePort43({}, stall=True) as server:
+            client = make_client(server.port, read_timeout=0.2)
+            with self.assertRaises(main.WHOISTimeoutError):
+                await client.query('example.com')
+
+    async def test_connect_timeout(self):
+        async def never_connects(*args, **kwargs):
+            await asyncio.sleep(3600)
+
+        client = make_client(43, connect_timeout=0.2)
+        with mock.patch('asyncio.open_connection', never_connects):
+            with self.assertRaises(main.WHOISTimeoutError):
+                await client.query('example.com')
+
+
+if __name__ == '__main__':
+    unittest.main()
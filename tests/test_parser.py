@@ -0,0 +1,220 @@
+"""WHOISParser tests over the recorded fixtures and hand written samples"""
+import os
+import sys
+import unittest
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import main
+
+FIXTURES = os.path.join(ROOT, 'fixtures', 'whois')
+
+# Expected fields of every fixture, fields left out must be None or empty
+EXPECTED = {
+    'afnic.fr': {
+        'domain_name': 'afnic.fr',
+        'registrar': 'AFNIC',
+        'creation_date': datetime(1995, 1, 1),
+        'expiration_date': datetime(2025, 12, 31, 23, 0),
+        'updated_date': datetime(2024, 1, 2, 8, 17, 34, 370064),
+        'name_servers': ['ns1.nic.fr', 'ns2.nic.fr', 'ns3.nic.fr'],
+        'status': ['ACTIVE', 'serverUpdateProhibited', 'serverTransferProhibited', 'serverDeleteProhibited'],
+        'emails': ['registry@afnic.fr'],
+    },
+    'bbc.co.uk': {
+        'domain_name': 'bbc.co.uk',
+        'registrar': 'British Broadcasting Corporation [Tag = BBC]',
+        'creation_date': 'before Aug-1996',
+        'expiration_date': datetime(2025, 12, 13),
+        'updated_date': datetime(2024, 11, 11),
+        'name_servers': ['dns0.bbc.co.uk', 'dns0.bbc.com', 'dns1.bbc.co.uk', 'dns1.bbc.com',
+                         'ddns0.akamai.net', 'ddns1.akamai.com'],
+        'status': ['Registered until expiry date.'],
+    },
+    'denic.de': {
+        'domain_name': 'denic.de',
+        'updated_date': datetime(2018, 9, 6, 14, 58, 9),
+        'name_servers': ['ns1.denic.de', 'ns2.denic.de', 'ns3.denic.de', 'ns4.denic.net'],
+        'status': ['connect'],
+    },
+    'example.com': {
+        'domain_name': 'EXAMPLE.COM',
+        'registrar': 'RESERVED-Internet Assigned Numbers Authority',
+        'registrar_url': 'http://res-dom.iana.org',
+        'whois_server': 'whois.iana.org',
+        'creation_date': datetime(1995, 8, 14, 4, 0),
+        'expiration_date': datetime(2025, 8, 13, 4, 0),
+        'updated_date': datetime(2024, 8, 14, 7, 1, 34),
+        'dnssec': 'signedDelegation',
+        'name_servers': ['a.iana-servers.net', 'b.iana-servers.net'],
+        'status': ['clientDeleteProhibited https://icann.org/epp#clientDeleteProhibited',
+                   'clientTransferProhibited https://icann.org/epp#clientTransferProhibited',
+                   'clientUpdateProhibited https://icann.org/epp#clientUpdateProhibited'],
+    },
+    'google.com': {
+        'domain_name': 'GOOGLE.COM',
+        'registrar': 'MarkMonitor Inc.',
+        'registrar_url': 'http://www.markmonitor.com',
+        'whois_server': 'whois.markmonitor.com',
+        'creation_date': datetime(1997, 9, 15, 4, 0),
+        'expiration_date': datetime(2028, 9, 14, 4, 0),
+        'updated_date': datetime(2019, 9, 9, 15, 39, 4),
+        'dnssec': 'unsigned',
+        'org': 'Google LLC',
+        'state': 'CA',
+        'country': 'US',
+        'name_servers': ['ns1.google.com', 'ns2.google.com', 'ns3.google.com', 'ns4.google.com'],
+        'status': ['clientDeleteProhibited https://icann.org/epp#clientDeleteProhibited',
+                   'clientTransferProhibited https://icann.org/epp#clientTransferProhibited',
+                   'clientUpdateProhibited https://icann.org/epp#clientUpdateProhibited',
+                   'serverDeleteProhibited https://icann.org/epp#serverDeleteProhibited',
+                   'serverTransferProhibited https://icann.org/epp#serverTransferProhibited',
+                   'serverUpdateProhibited https://icann.org/epp#serverUpdateProhibited'],
+        'emails': ['abusecomplaints@markmonitor.com'],
+    },
+    'jprs.jp': {
+        'domain_name': 'JPRS.JP',
+        'creation_date': datetime(2001, 2, 2),
+        'expiration_date': datetime(2025, 2, 28),
+        'updated_date': datetime(2024, 3, 1, 1, 5, 3),
+        'org': 'Japan Registry Services Co., Ltd.',
+        'name_servers': ['ns1.jprs.co.jp', 'ns2.jprs.co.jp', 'ns3.jprs.jp', 'ns4.jprs.jp'],
+        'status': ['Active'],
+        'emails': ['hostmaster@jprs.jp'],
+    },
+    'sidn.nl': {
+        'domain_name': 'sidn.nl',
+        'registrar': 'Stichting Internet Domeinregistratie Nederland',
+        'creation_date': datetime(1999, 4, 8),
+        'updated_date': datetime(2024, 3, 4),
+        'dnssec': 'yes',
+        'name_servers': ['ns1.sidn.nl', 'ns2.sidn.nl', 'ns3.sidn.nl'],
+        'status': ['active'],
+    },
+    'wikipedia.org': {
+        'domain_name': 'wikipedia.org',
+        'registrar': 'MarkMonitor Inc.',
+        'registrar_url': 'http://www.markmonitor.com',
+        'whois_server': 'http://whois.markmonitor.com',
+        'creation_date': datetime(2001, 1, 13, 0, 12, 14),
+        'expiration_date': datetime(2025, 1, 13, 0, 12, 14),
+        'updated_date': datetime(2024, 7, 12, 9, 15, 28),
+        'dnssec': 'unsigned',
+        'org': 'Wikimedia Foundation, Inc.',
+        'state': 'CA',
+        'city': 'REDACTED FOR PRIVACY',
+        'country': 'US',
+        'name_servers': ['ns0.wikimedia.org', 'ns1.wikimedia.org', 'ns2.wikimedia.org'],
+        'status': ['clientDeleteProhibited https://icann.org/epp#clientDeleteProhibited',
+                   'clientTransferProhibited https://icann.org/epp#clientTransferProhibited',
+                   'clientUpdateProhibited https://icann.org/epp#clientUpdateProhibited'],
+        'emails': ['abusecomplaints@markmonitor.com'],
+    },
+    'yandex.ru': {
+        'domain_name': 'YANDEX.RU',
+        'registrar': 'RU-CENTER-RU',
+        'creation_date': datetime(1997, 9, 23, 9, 45, 7),
+        'expiration_date': datetime(2025, 9, 30, 21, 0),
+        'org': 'YANDEX, LLC.',
+        'name_servers': ['ns1.yandex.ru', 'ns2.yandex.ru'],
+        'status': ['REGISTERED, DELEGATED, VERIFIED'],
+    },
+}
+
+# Registrar answer with redacted contacts and empty values, as most gTLD registrars send since 2018
+REDACTED_ICANN = """\
+Domain Name: redacted-example.com
+Registrar WHOIS Server: whois.registrar.example
+Registrar URL: http://www.registrar.example
+Updated Date: 2024-05-01T10:00:00Z
+Creation Date: 2010-05-01T10:00:00Z
+Registrar Registration Expiration Date: 2026-05-01T10:00:00Z
+Registrar: Example Registrar, LLC
+Registrar Abuse Contact Email: abuse@registrar.example
+Registrar Abuse Contact Phone: +1.5555550100
+Domain Status: clientTransferProhibited https://icann.org/epp#clientTransferProhibited
+Registry Registrant ID:
+Registrant Name: REDACTED FOR PRIVACY
+Registrant Organization:
+Registrant Street: REDACTED FOR PRIVACY
+Registrant City: REDACTED FOR PRIVACY
+Registrant State/Province:
+Registrant Postal Code: REDACTED FOR PRIVACY
+Registrant Country: IS
+Registrant Email: Please query the RDDS service of the Registrar of Record identified in this output for information on how to contact the Registrant
+Name Server: NS1.REGISTRAR.EXAMPLE
+Name Server: NS2.REGISTRAR.EXAMPLE
+DNSSEC:
+URL of the ICANN Whois Inaccuracy Complaint Form: https://www.icann.org/wicf/
+>>> Last update of WHOIS database: 2024-10-17T12:00:00Z <<<
+"""
+
+
+class FixtureTest(unittest.TestCase):
+    """Every recorded registry answer parses to the expected fields"""
+    def setUp(self):
+        self.parser = main.WHOISParser()
+
+    def parse_fixture(self, domain):
+        with open(os.path.join(FIXTURES, domain + '.txt')) as f:
+            return self.parser.parse(domain, f.read())
+
+    def test_every_fixture_is_covered(self):
+        names = {name[:-4] for name in os.listdir(FIXTURES) if name.endswith('.txt')}
+        self.assertEqual(names, set(EXPECTED) | {'not-registered-xyz123.com'})
+
+    def test_fixtures(self):
+        for domain, expected in EXPECTED.items():
+            with self.subTest(domain=domain):
+                record = self.parse_fixture(domain)
+                for field in main.WHOISParser.EMPTY_FIELDS:
+                    self.assertEqual(record[field], expected.get(field), field)
+                for field in main.WHOISParser.LIST_FIELDS:
+                    self.assertEqual(record[field], expected.get(field, []), field)
+
+    def test_no_match(self):
+        with self.assertRaises(main.WHOISLookupError):
+            self.parse_fixture('not-registered-xyz123.com')
+
+
+class ContinuationTest(unittest.TestCase):
+    """Values continue on indented lines only, never on a sibling label"""
+    def setUp(self):
+        self.parser = main.WHOISParser()
+
+    def test_redacted_icann_sample(self):
+        record = self.parser.parse('redacted-example.com', REDACTED_ICANN)
+        self.assertIsNone(record['org'])
+        self.assertIsNone(record['state'])
+        self.assertIsNone(record['dnssec'])
+        self.assertEqual(record['city'], 'REDACTED FOR PRIVACY')
+        self.assertEqual(record['country'], 'IS')
+        self.assertEqual(record['registrar'], 'Example Registrar, LLC')
+        self.assertEqual(record['expiration_date'], datetime(2026, 5, 1, 10, 0))
+        self.assertEqual(record['name_servers'], ['ns1.registrar.example', 'ns2.registrar.example'])
+        self.assertEqual(record['emails'], ['abuse@registrar.example'])
+
+    def test_indented_sample_keeps_sibling_labels(self):
+        text = "   Registrant Organization: \n   Registrant Street: REDACTED FOR PRIVACY\n   DNSSEC:\n" \
+               "   URL of the ICANN Whois Inaccuracy Complaint Form: https://www.icann.org/wicf/\n"
+        record = self.parser.parse('example.com', text)
+        self.assertIsNone(record['org'])
+        self.assertIsNone(record['dnssec'])
+
+    def test_indented_values_with_colons(self):
+        text = "    Name servers:\n        ns1.example.co.uk  2001:db8::1\n        ns2.example.co.uk\n\n" \
+               "    WHOIS lookup made at 12:00:00 17-Oct-2024\n"
+        record = self.parser.parse('example.co.uk', text)
+        self.assertEqual(record['name_servers'], ['ns1.example.co.uk', 'ns2.example.co.uk'])
+
+    def test_block_ends_at_label_indent(self):
+        text = "Domain nameservers:\n   ns1.example.nl\nStatus: active\n"
+        record = self.parser.parse('example.nl', text)
+        self.assertEqual(record['name_servers'], ['ns1.example.nl'])
+        self.assertEqual(record['status'], ['active'])
+
+
+if __name__ == '__main__':
+    unittest.main()
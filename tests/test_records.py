@@ -0,0 +1,103 @@
+"""Compact record, record batch and sorted batch output tests"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import main
+
+FIXTURES = os.path.join(ROOT, 'fixtures', 'whois')
+
+
+def parse_fixture(domain):
+    with open(os.path.join(FIXTURES, domain + '.txt')) as f:
+        return main.WHOISParser().parse(domain, f.read())
+
+
+class CompactRecordTest(unittest.TestCase):
+    def test_round_trip(self):
+        for domain in ('google.com', 'bbc.co.uk', 'denic.de'):
+            with self.subTest(domain=domain):
+                record = parse_fixture(domain)
+                compact = main.CompactRecord.from_record(record)
+                for field in main.CompactRecord.STRING_FIELDS + main.CompactRecord.DATE_FIELDS:
+                    self.assertEqual(getattr(compact, field), record[field], field)
+                for field in main.CompactRecord.LIST_FIELDS:
+                    self.assertEqual(compact.get(field), record[field] or None, field)
+
+    def test_renders_like_the_parsed_record(self):
+        tool = main.ColorfulWHOIS(quiet=True)
+        record = parse_fixture('google.com')
+        compact = main.CompactRecord.from_record(record)
+        self.assertEqual(tool.format_whois_output(compact), tool.format_whois_output(record))
+        self.assertEqual(main.build_record('google.com', compact), main.build_record('google.com', record))
+
+
+class RecordBatchTest(unittest.TestCase):
+    def setUp(self):
+        self.batch = main.RecordBatch()
+        for domain in ('google.com', 'bbc.co.uk', 'denic.de', 'example.com'):
+            self.batch.append(parse_fixture(domain), domain)
+
+    def test_rows_round_trip(self):
+        for row, domain in enumerate(('google.com', 'bbc.co.uk', 'denic.de', 'example.com')):
+            record = parse_fixture(domain)
+            held = self.batch[row]
+            self.assertEqual(held.domain_name, domain)
+            self.assertEqual(held.registrar, record['registrar'])
+            self.assertEqual(held.creation_date, record['creation_date'])
+            self.assertEqual(held.expiration_date, record['expiration_date'])
+            self.assertEqual(held.name_servers, record['name_servers'] or None)
+
+    def test_order_by_keeps_missing_values_last(self):
+        # denic.de publishes no expiry date
+        self.assertEqual(self.batch.order_by('expiration_date'), [3, 1, 0, 2])
+        self.assertEqual(self.batch.order_by('expiration_date', reverse=True), [0, 1, 3, 2])
+        self.assertEqual(self.batch.order_by('domain_name'), [1, 2, 3, 0])
+
+    def test_result_keeps_addresses_and_errors(self):
+        self.batch.append(parse_fixture('sidn.nl'), 'sidn.nl', (['192.0.2.1'], ['2001:db8::1']))
+        self.batch.append(None, 'timeout.com', error=main.WHOISTimeoutError("Reading from whois.example timed out"))
+        domain, whois_data, addresses, error = self.batch.result(4)
+        self.assertEqual((domain, addresses, error), ('sidn.nl', (('192.0.2.1',), ('2001:db8::1',)), None))
+        self.assertEqual(whois_data.registrar, 'Stichting Internet Domeinregistratie Nederland')
+        self.assertEqual(self.batch.result(5), ('timeout.com', None, None, 'Reading from whois.example timed out'))
+        self.assertEqual(self.batch.result(0)[2], None)
+
+
+class StubTool(main.ColorfulWHOIS):
+    """Tool answering from memory with one expiry date per domain"""
+    EXPIRY = {'b.com': datetime(2030, 1, 1), 'c.com': datetime(2026, 1, 1), 'd.com': None}
+
+    async def query_domain_async(self, domain):
+        await asyncio.sleep(0.001 * len(domain))
+        if domain not in self.EXPIRY:
+            raise main.WHOISTimeoutError(f"Reading from whois.example timed out for {domain}")
+        return main.WHOISRecord(domain_name=domain.upper(), registrar='Example Registrar, Inc.',
+                                expiration_date=self.EXPIRY[domain])
+
+
+class SortedBatchTest(unittest.TestCase):
+    def test_results_are_written_in_field_order(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'sorted.jsonl')
+            tool = StubTool(quiet=True)
+            tool.notify = lambda *args, **kwargs: None
+            succeeded, failed = tool.run_batch(['d.com', 'b.com', 'a.com', 'c.com'], output=output,
+                                               output_format='jsonl', sort_by='expiration_date')
+            with open(output) as f:
+                records = [json.loads(line) for line in f]
+        self.assertEqual((succeeded, failed), (3, 1))
+        self.assertEqual([record['domain'] for record in records], ['c.com', 'b.com', 'd.com', 'a.com'])
+        self.assertEqual(records[0]['expiration_date'], '2026-01-01T00:00:00')
+        self.assertIn('timed out', records[3]['error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+"""HTTP lookup service tests with a stub tool instead of real WHOIS lookups"""
+import asyncio
+import json
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import main
+
+
+class StubTool:
+    """Answers example.com, knows no-match.com is free and fails everything else"""
+    metrics = None
+
+    async def query_domain_async(self, domain):
+        if domain == 'example.com':
+            return {'registrar': 'Example Registrar, Inc.', 'name_servers': ['a.iana-servers.net']}
+        if domain == 'no-match.com':
+            raise main.WHOISNotFoundError(f"No match for {domain}")
+        raise main.WHOISTimeoutError("Reading from whois.verisign-grs.com timed out")
+
+
+class ServiceTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.service = main.WHOISService(StubTool())
+        self.server = await asyncio.start_server(self.service.handle, '127.0.0.1', 0)
+        port = self.server.sockets[0].getsockname()[1]
+        self.reader, self.writer = await asyncio.open_connection('127.0.0.1', port)
+
+    async def asyncTearDown(self):
+        self.writer.close()
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def request(self, method, target, body=b''):
+        """Send one keep-alive request and return (status, decoded JSON body)"""
+        self.writer.write(f"{method} {target} HTTP/1.1\r\nHost: localhost\r\n"
+                          f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+        status = int((await self.reader.readline()).split()[1])
+        headers = {}
+        while (line := await self.reader.readline()) != b'\r\n':
+            name, _, value = line.decode().partition(':')
+            headers[name.lower()] = value.strip()
+        payload = await self.reader.readexactly(int(headers['content-length']))
+        return status, json.loads(payload)
+
+    async def test_found(self):
+        status, record = await self.request('GET', '/lookup?domain=Example.COM')
+        self.assertEqual(status, 200)
+        self.assertEqual(record['registrar'], 'Example Registrar, Inc.')
+        self.assertIsNone(record['error'])
+
+    async def test_no_match_is_not_found(self):
+        status, record = await self.request('GET', '/lookup?domain=no-match.com')
+        self.assertEqual(status, 404)
+        self.assertEqual(record['error'], 'No match for no-match.com')
+
+    async def test_upstream_failure_is_bad_gateway(self):
+        status, record = await self.request('GET', '/lookup?domain=timeout.com')
+        self.assertEqual(status, 502)
+        self.assertIn('timed out', record['error'])
+
+    async def test_request_body_keeps_connection_usable(self):
+        status, _ = await self.request('POST', '/lookup?domain=example.com', b'{"domain": "example.com"}')
+        self.assertEqual(status, 405)
+        status, record = await self.request('GET', '/lookup?domain=example.com')
+        self.assertEqual(status, 200)
+        self.assertEqual(record['domain'], 'example.com')
+
+
+if __name__ == '__main__':
+    unittest.main()
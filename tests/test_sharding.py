@@ -0,0 +1,49 @@
+"""Shard assignment and per-shard server limit tests"""
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import main
+
+
+class ShardOfTest(unittest.TestCase):
+    def test_tld_sharding_keeps_shared_registries_together(self):
+        for count in (2, 3, 4, 8, 16):
+            with self.subTest(count=count):
+                self.assertEqual(main.shard_of('example.com', count), main.shard_of('example.net', count))
+                self.assertEqual(main.shard_of('example.org', count), main.shard_of('example.ngo', count))
+                self.assertEqual(main.shard_of('a.example.com', count), main.shard_of('b.com', count))
+
+    def test_domain_sharding_spreads_one_tld(self):
+        shards = {main.shard_of(f"domain{index}.com", 4, 'domain') for index in range(100)}
+        self.assertEqual(shards, {0, 1, 2, 3})
+
+    def test_growing_the_count_only_moves_keys_to_the_new_shard(self):
+        for index in range(200):
+            domain = f"domain{index}.com"
+            before, after = main.shard_of(domain, 4, 'domain'), main.shard_of(domain, 5, 'domain')
+            self.assertIn(after, (before, 4))
+
+
+class ShardLimitTest(unittest.TestCase):
+    def test_unclaimed_servers_get_a_share_of_the_limits(self):
+        scheduler = main.ServerScheduler({'whois.verisign-grs.com': (20, 8)}, default_rate=5, default_concurrency=10,
+                                         shards=4)
+        scheduler.claim('whois.verisign-grs.com')
+        registry = scheduler.state('whois.verisign-grs.com')
+        self.assertEqual((registry.base_rate, registry.bucket.rate), (20, 20))
+        iana = scheduler.state('whois.iana.org')
+        self.assertEqual(iana.base_rate, 1.25)
+        registrar = scheduler.state('whois.markmonitor.com')
+        self.assertEqual(registrar.base_rate, 1.25)
+
+    def test_unsharded_runs_keep_full_limits(self):
+        scheduler = main.ServerScheduler(default_rate=5, default_concurrency=10)
+        self.assertEqual(scheduler.state('whois.iana.org').base_rate, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
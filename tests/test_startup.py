@@ -0,0 +1,94 @@
+"""Start-up regression tests for single-domain command lines"""
+import os
+import py_compile
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import main
+
+
+class StartupTest(unittest.TestCase):
+    """--help and cache hits must stay fast and must not load the network stack"""
+    # Time spent on top of a bare interpreter start, as a multiple of that start, so the
+    # check holds on slow and fast machines alike; the absolute budget lives in benchmark.py
+    OVERHEAD = 2.5
+    # The fastest of a few interleaved runs counts, which keeps machine noise out of the verdict
+    RUNS = 7
+
+    # Modules that only network lookups, batches and the service need
+    HEAVY_MODULES = ('asyncio', 'socket', 'ssl', 'concurrent.futures', 'csv', 'hashlib', 'zlib', 'whois')
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.cache_path = os.path.join(cls.directory.name, 'responses.sqlite3')
+        with open(os.path.join(ROOT, 'fixtures', 'whois', 'example.com.txt')) as f:
+            text = f.read()
+        cache = main.WHOISCache(cls.cache_path)
+        cache.put(main.WHOISResponse('example.com', text, ['whois.verisign-grs.com']))
+        cache.close()
+        # Installed copies run from compiled bytecode after their first start
+        py_compile.compile(main.__file__)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def run_main(self, *args):
+        """Run the tool in a fresh interpreter and return the result"""
+        return subprocess.run([sys.executable, '-m', 'main', *args], cwd=ROOT, capture_output=True, text=True)
+
+    def assert_overhead(self, *args):
+        """Compare the tool's start-up with `python -c pass`, interleaving runs so both see the same load"""
+        baseline = best = float('inf')
+        for _ in range(self.RUNS):
+            started = time.perf_counter()
+            subprocess.run([sys.executable, '-c', 'pass'], cwd=ROOT, capture_output=True)
+            baseline = min(baseline, time.perf_counter() - started)
+
+            started = time.perf_counter()
+            result = self.run_main(*args)
+            best = min(best, time.perf_counter() - started)
+            self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertLess(best - baseline, self.OVERHEAD * baseline,
+                        f"{' '.join(args)} took {best * 1000:.1f}ms against {baseline * 1000:.1f}ms for python -c pass")
+
+    def loaded_modules(self, *args):
+        """Run main() in a fresh interpreter and list the heavy modules it imported"""
+        script = ("import sys, main\n"
+                  f"sys.argv = ['main', *{args!r}]\n"
+                  "try:\n"
+                  "    main.main()\n"
+                  "except SystemExit:\n"
+                  "    pass\n"
+                  f"print('loaded:', *(name for name in {self.HEAVY_MODULES!r} if name in sys.modules), file=sys.stderr)\n")
+        result = subprocess.run([sys.executable, '-c', script], cwd=ROOT, capture_output=True, text=True)
+        return result.stderr.rsplit('loaded:', 1)[1].split()
+
+    def test_help_overhead(self):
+        self.assert_overhead('--help')
+
+    def test_cache_hit_overhead(self):
+        self.assert_overhead('example.com', '--cache-path', self.cache_path)
+
+    def test_cache_hit_answers_from_cache(self):
+        result = self.run_main('example.com', '--cache-path', self.cache_path)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn('EXAMPLE.COM', result.stdout)
+        self.assertIn('1 hits', result.stdout + result.stderr)
+
+    def test_help_imports_no_heavy_modules(self):
+        self.assertEqual(self.loaded_modules('--help'), [])
+
+    def test_cache_hit_imports_no_heavy_modules(self):
+        self.assertEqual(self.loaded_modules('example.com', '--cache-path', self.cache_path), [])
+
+
+if __name__ == '__main__':
+    unittest.main()